@@ -0,0 +1,74 @@
+import hashlib
+import io
+import os
+from functools import lru_cache
+
+import streamlit as st
+from PIL import Image, features
+
+# Logo and stylesheet shared by the questionnaire pages. The logo is decoded,
+# downscaled and re-encoded once per process and width rather than on every
+# rerun; the stylesheet is a static file the browser fetches once and caches,
+# so a rerun only re-sends a short <link> tag.
+LOGO_PATH = "logo.png"
+LOGO_WIDTHS = (200, 400)
+# Display width assumed when the logo fills the sidebar
+SIDEBAR_WIDTH_PX = 300
+THEME_PATH = os.path.join("static", "theme.css")
+
+
+@lru_cache(maxsize=None)
+def logo_bytes(width, path=LOGO_PATH):
+    # Never upscaled; WebP when Pillow was built with it, else optimized PNG
+    with Image.open(path) as image:
+        image = image.convert("RGBA")
+    if image.width > width:
+        height = round(image.height * width / image.width)
+        image = image.resize((width, height), Image.LANCZOS)
+    buffer = io.BytesIO()
+    if features.check("webp"):
+        image.save(buffer, "WEBP", quality=90, method=6)
+    else:
+        image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _asset_width(display_width):
+    # Smallest prepared width that is still sharp on 2x displays
+    return next((w for w in LOGO_WIDTHS if w >= 2 * display_width), LOGO_WIDTHS[-1])
+
+
+def show_logo(container=st, width=None):
+    # width=None fills the container, like use_column_width=True
+    asset = logo_bytes(_asset_width(width or SIDEBAR_WIDTH_PX))
+    container.image(asset, width=width, use_column_width=width is None)
+
+
+@lru_cache(maxsize=None)
+def _theme_css(path=THEME_PATH):
+    with open(path) as f:
+        return f.read()
+
+
+@lru_cache(maxsize=None)
+def _theme_link(path=THEME_PATH):
+    # Versioned by content, so an edited stylesheet isn't served stale
+    version = hashlib.sha256(_theme_css(path).encode()).hexdigest()[:12]
+    url = "app/" + path.replace(os.sep, "/")
+    return f'<link rel="stylesheet" href="{url}?v={version}">'
+
+
+@lru_cache(maxsize=None)
+def _inline_theme(path=THEME_PATH):
+    # Minified fallback for when static serving is turned off
+    css = " ".join(line.strip() for line in _theme_css(path).splitlines())
+    return f"<style>{css}</style>"
+
+
+def apply_theme():
+    # Streamlit drops elements a full rerun doesn't re-emit, so this still runs
+    # every rerun; fragment reruns skip it
+    if st.get_option("server.enableStaticServing"):
+        st.markdown(_theme_link(), unsafe_allow_html=True)
+    else:
+        st.markdown(_inline_theme(), unsafe_allow_html=True)
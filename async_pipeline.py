@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import openai
+import streamlit as st
+from postgrest import AsyncPostgrestClient
+from postgrest.utils import AsyncClient
+
+from clients import (
+    HTTP2_ENABLED,
+    SUPABASE_KEY,
+    SUPABASE_URL,
+    UNIFY_API_BASE,
+    UNIFY_API_KEY,
+    get_registry,
+)
+from hedging import LLM_DEADLINE_S
+from projections import afetch_projected_submission
+from recorder import recorded
+
+
+class BackgroundLoop:
+    # A dedicated event loop on its own thread. Streamlit script threads hand
+    # coroutines to it and wait only on their own future, so sessions overlap
+    # their I/O instead of each spinning up a loop with asyncio.run.
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="async-pipeline", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        return self.submit(coro).result(timeout)
+
+
+@st.cache_resource
+def get_loop():
+    return BackgroundLoop()
+
+
+# Async clients are bound to the background loop, so they are built lazily
+# from inside it on first use
+_async_clients = None
+
+
+async def aclients():
+    global _async_clients
+    if _async_clients is None:
+        registry = get_registry()
+        transport = httpx.AsyncHTTPTransport(
+            http2=HTTP2_ENABLED, limits=registry.limits
+        )
+        http = httpx.AsyncClient(transport=transport, timeout=registry.timeout)
+        postgrest = AsyncPostgrestClient(
+            f"{SUPABASE_URL}/rest/v1",
+            headers={
+                "apikey": SUPABASE_KEY,
+                "Authorization": f"Bearer {SUPABASE_KEY}",
+            },
+        )
+        # Send PostgREST requests through the same async pool as the LLM calls
+        default_session = postgrest.session
+        postgrest.session = AsyncClient(
+            base_url=default_session.base_url,
+            headers=default_session.headers,
+            timeout=registry.timeout,
+            transport=transport,
+            follow_redirects=True,
+        )
+        llm = openai.AsyncOpenAI(
+            api_key=UNIFY_API_KEY, base_url=UNIFY_API_BASE, http_client=http
+        )
+        _async_clients = (postgrest, llm)
+        await default_session.aclose()
+    return _async_clients
+
+
+async def apredict(predictor, tags=None, **inputs):
+    # Async counterpart of StreamingPredict.__call__, without streaming. Runs on
+    # the background loop's thread, so the predictor needs an explicit lm.
+    # Token counting and the SQLite prediction cache block, so they run in
+    # the default executor rather than stalling every other session's I/O.
+    _, llm = await aclients()
+    generation = await asyncio.to_thread(predictor.stream, tags=tags, **inputs)
+    cached = await asyncio.to_thread(generation.cached_completion)
+    if cached is not None:
+        return await asyncio.to_thread(generation.complete, cached)
+
+    started = time.perf_counter()
+    response = await asyncio.wait_for(
+        llm.chat.completions.create(**generation.request_params()), LLM_DEADLINE_S
+    )
+    generation.timing.total_s = time.perf_counter() - started
+    generation.record_timing()
+    return await asyncio.to_thread(
+        generation.complete, response.choices[0].message.content or ""
+    )
+
+
+async def afetch_submission_row(email, consumer):
+    postgrest, _ = await aclients()
+    return await afetch_projected_submission(postgrest, email, consumer)
+
+
+async def afetch_latest_summary(email):
+    postgrest, _ = await aclients()
+    result = await (
+        postgrest.from_("business_summaries")
+        .select("summary")
+        .eq("email", email)
+        .order("updated_at", desc=True)
+        .limit(1)
+        .execute()
+    )
+    return result.data[0]["summary"] if result.data else None
+
+
+async def asave_summary(email, summary):
+    postgrest, _ = await aclients()
+    row = {"email": email, "summary": summary}
+    with recorded(
+        "db.upsert", table="business_summaries", on_conflict="email", row=row
+    ):
+        await (
+            postgrest.from_("business_summaries")
+            .upsert(row, on_conflict="email")
+            .execute()
+        )
+
+
+async def aload_business(email, consumer):
+    # The submission row and any previously saved summary are independent,
+    # so fetch them concurrently
+    return await asyncio.gather(
+        afetch_submission_row(email, consumer), afetch_latest_summary(email)
+    )
@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Replays a recorded corpus (RECORD_REQUESTS_PATH, see recorder.py) against the
+# current code, with fake_supabase.py and fake_unify.py standing in for the
+# hosted services, and reports throughput and per-stage latency percentiles.
+#
+#   python bench.py --corpus request_corpus.jsonl --concurrency 8
+#   python bench.py --synthetic 200 --save-baseline
+#   python bench.py --synthetic 200 --baseline bench_baseline.json
+DEFAULT_CORPUS = os.getenv("RECORD_REQUESTS_PATH", "request_corpus.jsonl")
+DEFAULT_BASELINE = "bench_baseline.json"
+SUMMARY_MODEL = "mixtral-8x7b-instruct-v0.1@together-ai"
+
+
+def configure_environment(scratch):
+    # Must run before any app module is imported: point the clients at the
+    # fakes, and keep the replay out of the real ledger, cache and corpus
+    os.environ["LOCAL_BACKENDS"] = "1"
+    os.environ.pop("RECORD_REQUESTS_PATH", None)
+    os.environ["USAGE_LOG_PATH"] = os.path.join(scratch, "usage.log")
+    os.environ["PREDICTION_CACHE_PATH"] = os.path.join(scratch, "predictions.sqlite3")
+
+
+def synthetic_corpus(count, seed=0):
+    # One summary page visit per fake business: read the row, generate, save
+    from fake_supabase import fake_submission
+    from projections import SUBMISSION_COLUMNS
+
+    rng = random.Random(seed)
+    columns = SUBMISSION_COLUMNS["business_summary"]
+    for index in range(count):
+        row = fake_submission(index, rng)
+        projected = {column: row.get(column) for column in columns}
+        yield {
+            "stage": "db.select",
+            "table": "form_submissions",
+            "email": row["email"],
+            "columns": ",".join(columns),
+            "row": row,
+        }
+        yield {
+            "stage": "llm",
+            "signature": "BusinessSummary",
+            "params": {"model": SUMMARY_MODEL, "temperature": 0.0, "max_tokens": 150},
+            "inputs": {"form_data": projected},
+            "force": False,
+        }
+        yield {
+            "stage": "db.upsert",
+            "table": "business_summaries",
+            "on_conflict": "email",
+            "row": {"email": row["email"], "summary": "..."},
+        }
+
+
+def seed_database(database, records):
+    # Every row a recorded read returned must exist in the fake
+    rows = {}
+    for record in records:
+        if record["stage"] == "db.select" and record.get("row"):
+            email = record["email"]
+            rows[email] = {**rows.get(email, {"email": email}), **record["row"]}
+    rows = [{k: v for k, v in row.items() if k != "id"} for row in rows.values()]
+    database.insert("form_submissions", rows, on_conflict="email", merge=True)
+
+
+class Replayer:
+    def __init__(self, cold=False):
+        from clients import get_supabase, unify_lm
+        from funnel import FunnelSection
+        from prediction_cache import prediction_cache
+        from signatures import BusinessAnalysis, BusinessSummary
+        from streaming import StreamingPredict
+        from submission_cache import fetch_submission
+
+        self.supabase = get_supabase()
+        self.unify_lm = unify_lm
+        self.fetch_submission = fetch_submission
+        self.StreamingPredict = StreamingPredict
+        self.signatures = {
+            "BusinessSummary": BusinessSummary,
+            "BusinessAnalysis": BusinessAnalysis,
+            "FunnelSection": FunnelSection,
+        }
+        self.cache = prediction_cache
+        self.cold = cold
+        self._predictors = {}
+
+    def predictor(self, signature, params):
+        key = (signature, json.dumps(params, sort_keys=True))
+        if key not in self._predictors:
+            kwargs = {k: v for k, v in params.items() if k != "model"}
+            lm = self.unify_lm(params["model"], **kwargs)
+            self._predictors[key] = self.StreamingPredict(
+                self.signatures[signature],
+                lm=lm,
+                cache=None if self.cold else self.cache,
+            )
+        return self._predictors[key]
+
+    def replay(self, record):
+        # Returns [(stage, seconds), ...] for one recorded interaction
+        stage = record["stage"]
+        started = time.perf_counter()
+        if stage == "db.select":
+            self.fetch_submission(self.supabase, record["email"], record["columns"])
+        elif stage == "db.upsert":
+            query = self.supabase.table(record["table"])
+            on_conflict = record.get("on_conflict") or ""
+            query.upsert(record["row"], on_conflict=on_conflict).execute()
+        elif stage == "db.insert":
+            self.supabase.table(record["table"]).insert(record["row"]).execute()
+        elif stage == "llm":
+            predictor = self.predictor(record["signature"], record["params"])
+            generation = predictor.stream(
+                force=record.get("force", False), **record["inputs"]
+            )
+            first_token = None
+            for _ in generation:
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+            total = time.perf_counter() - started
+            return [("llm.first_token", first_token or total), ("llm.total", total)]
+        else:
+            raise ValueError(f"unknown stage {stage!r}")
+        return [(stage, time.perf_counter() - started)]
+
+
+def run(records, replayer, concurrency):
+    samples = defaultdict(list)
+    errors = defaultdict(list)
+
+    def replay(record):
+        try:
+            return replayer.replay(record), None
+        except Exception as error:
+            return None, (record["stage"], repr(error))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for result, error in executor.map(replay, records):
+            if error:
+                errors[error[0]].append(error[1])
+                continue
+            for stage, seconds in result:
+                samples[stage].append(seconds)
+    elapsed = time.perf_counter() - started
+    return samples, errors, elapsed
+
+
+def report(records, samples, errors, elapsed, concurrency):
+    from model_router import percentile
+
+    stages = {}
+    for stage in sorted(set(samples) | set(errors)):
+        values = samples.get(stage, [])
+        stages[stage] = {
+            "count": len(values),
+            "errors": len(errors.get(stage, [])),
+            "p50_s": percentile(values, 0.5),
+            "p95_s": percentile(values, 0.95),
+            "p99_s": percentile(values, 0.99),
+        }
+    return {
+        "records": len(records),
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(records) / elapsed if elapsed else 0.0,
+        "stages": stages,
+        "sample_errors": {stage: errs[:3] for stage, errs in errors.items()},
+    }
+
+
+def regressions(current, baseline, threshold):
+    # Slower p95/p99 or lower throughput by more than threshold (a fraction)
+    found = []
+    if current["throughput_rps"] < baseline["throughput_rps"] * (1 - threshold):
+        found.append(
+            f"throughput {current['throughput_rps']:.2f}/s vs "
+            f"{baseline['throughput_rps']:.2f}/s"
+        )
+    for stage, stats in current["stages"].items():
+        before = baseline["stages"].get(stage)
+        if before is None:
+            continue
+        for key in ("p95_s", "p99_s"):
+            if stats[key] is None or not before[key]:
+                continue
+            if stats[key] > before[key] * (1 + threshold):
+                found.append(f"{stage} {key} {stats[key]:.3f}s vs {before[key]:.3f}s")
+        if stats["errors"] > before["errors"]:
+            found.append(f"{stage} errors {stats['errors']} vs {before['errors']}")
+    return found
+
+
+def print_report(result):
+    print(
+        f"{result['records']} records, concurrency {result['concurrency']}, "
+        f"{result['elapsed_s']:.2f}s, {result['throughput_rps']:.2f} records/s"
+    )
+    print(
+        f"{'stage':<18} {'count':>6} {'errors':>6} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8}"
+    )
+    for stage, stats in result["stages"].items():
+        cells = [
+            "-" if stats[key] is None else f"{stats[key]:.3f}"
+            for key in ("p50_s", "p95_s", "p99_s")
+        ]
+        print(
+            f"{stage:<18} {stats['count']:>6} {stats['errors']:>6} "
+            f"{cells[0]:>8} {cells[1]:>8} {cells[2]:>8}"
+        )
+    for stage, messages in result["sample_errors"].items():
+        for message in messages:
+            print(f"  {stage}: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a request corpus")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument(
+        "--synthetic", type=int, help="replay N generated page visits instead"
+    )
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument(
+        "--cold", action="store_true", help="bypass the prediction cache"
+    )
+    parser.add_argument(
+        "--external",
+        action="store_true",
+        help="use fakes already running on the FAKE_* ports",
+    )
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench-")
+    configure_environment(scratch)
+
+    import fake_supabase
+    import fake_unify
+    from usage_ledger import read_records
+
+    if args.synthetic:
+        records = list(synthetic_corpus(args.synthetic))
+    else:
+        records = list(read_records(args.corpus))
+    if not records:
+        sys.exit(f"no records in {args.corpus}; record some or use --synthetic")
+    records *= args.repeat
+
+    if not args.external:
+        database = fake_supabase.FakeDatabase(os.path.join(scratch, "db.sqlite3"))
+        seed_database(database, records)
+        fake_supabase.serve(database=database)
+        fake_unify.serve()
+
+    samples, errors, elapsed = run(records, Replayer(args.cold), args.concurrency)
+    result = report(records, samples, errors, elapsed, args.concurrency)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+    failed = {stage: stats["errors"] for stage, stats in result["stages"].items()}
+    failed = {stage: count for stage, count in failed.items() if count}
+    if args.save_baseline:
+        # A baseline has to time requests that worked, not failures
+        if failed:
+            sys.exit(f"not writing a baseline, the run had errors: {failed}")
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if any(stats["errors"] for stats in baseline["stages"].values()):
+            sys.exit(f"{args.baseline} recorded a run with errors; save a new one")
+        found = regressions(result, baseline, args.threshold)
+        for regression in found:
+            print(f"REGRESSION: {regression}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+
+import dspy
+import httpx
+import openai
+import streamlit as st
+from dotenv import load_dotenv
+from postgrest.utils import SyncClient
+from supabase import create_client, Client
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+UNIFY_API_KEY = os.getenv("UNIFY_API_KEY")
+UNIFY_API_BASE = os.getenv("UNIFY_API_BASE", "https://api.unify.ai/v0/")
+
+# LOCAL_BACKENDS=1 talks to fake_supabase.py and fake_unify.py instead of the
+# hosted services, for benchmarks and tests without credentials or network
+LOCAL_BACKENDS = os.getenv("LOCAL_BACKENDS") == "1"
+if LOCAL_BACKENDS:
+    from fake_supabase import FAKE_SUPABASE_HOST, FAKE_SUPABASE_KEY, FAKE_SUPABASE_PORT
+    from fake_unify import FAKE_UNIFY_HOST, FAKE_UNIFY_PORT
+
+    SUPABASE_URL = f"http://{FAKE_SUPABASE_HOST}:{FAKE_SUPABASE_PORT}"
+    SUPABASE_KEY = FAKE_SUPABASE_KEY
+    UNIFY_API_BASE = f"http://{FAKE_UNIFY_HOST}:{FAKE_UNIFY_PORT}/v0/"
+    UNIFY_API_KEY = "local"
+
+# Pool limits and timeouts shared by every outbound HTTP call in the process
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") != "0"
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "120"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+# Prompt/response pairs an LM keeps for inspect_history(); the LMs are shared
+# by every session for the life of the server, so the list is capped
+LM_HISTORY_LIMIT = int(os.getenv("LM_HISTORY_LIMIT", "20"))
+
+
+class ClientRegistry:
+    def __init__(self):
+        self.limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        self.timeout = httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+        # One keep-alive connection pool for the whole worker process. Every
+        # client below sends through it, so TCP/TLS handshakes to Supabase and
+        # Unify are paid once per worker instead of once per session.
+        self.transport = httpx.HTTPTransport(http2=HTTP2_ENABLED, limits=self.limits)
+        self.http = httpx.Client(transport=self.transport, timeout=self.timeout)
+        self.supabase = self._create_supabase()
+        self.openai = self._create_openai()
+
+    def _create_supabase(self):
+        client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        # Swap PostgREST's private session for one on the shared pool, keeping
+        # the base URL and auth headers supabase-py set up
+        postgrest = client.postgrest
+        session = postgrest.session
+        postgrest.session = SyncClient(
+            base_url=session.base_url,
+            headers=session.headers,
+            timeout=self.timeout,
+            transport=self.transport,
+            follow_redirects=True,
+        )
+        session.close()
+        return client
+
+    def _create_openai(self):
+        # dspy.OpenAI talks to the module-level openai client, which picks up
+        # openai.http_client the first time it is built
+        openai.http_client = self.http
+        return openai.OpenAI(
+            api_key=UNIFY_API_KEY, base_url=UNIFY_API_BASE, http_client=self.http
+        )
+
+    def pool_stats(self):
+        # httpx keeps the pool private; report None rather than break if an
+        # upgrade moves it
+        pool = getattr(self.transport, "_pool", None)
+        connections = getattr(pool, "connections", None)
+        return {
+            "http2": HTTP2_ENABLED,
+            "connections": None if connections is None else len(connections),
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        }
+
+
+@st.cache_resource
+def get_registry():
+    return ClientRegistry()
+
+
+def get_supabase() -> Client:
+    return get_registry().supabase
+
+
+def get_openai():
+    return get_registry().openai
+
+
+def trim_history(lm):
+    del lm.history[:-LM_HISTORY_LIMIT]
+
+
+class SharedOpenAI(dspy.OpenAI):
+    # dspy.OpenAI appends every request to history; this one keeps only the
+    # most recent LM_HISTORY_LIMIT
+    def basic_request(self, prompt, **kwargs):
+        response = super().basic_request(prompt, **kwargs)
+        trim_history(self)
+        return response
+
+
+@st.cache_resource
+def unify_lm(model, **kwargs):
+    # Unify is OpenAI-compatible; requests go through the shared pool
+    get_registry()
+    return SharedOpenAI(
+        api_base=UNIFY_API_BASE,
+        api_key=UNIFY_API_KEY,
+        model=model,
+        model_type="chat",
+        **kwargs,
+    )
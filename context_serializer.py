@@ -0,0 +1,104 @@
+import json
+import re
+from collections.abc import Mapping
+from functools import lru_cache
+
+# Compact, deterministic text rendering of a form_submissions row for prompts.
+# Bookkeeping columns, empty values and untouched "Example:" placeholders are
+# dropped, so the same business always produces the same, shortest prompt.
+SUBMISSION_LABELS = (
+    ("avatar_desc", "Ideal client"),
+    ("avatar_pain_list", "Client pains"),
+    ("uvp_type", "Positioning"),
+    ("unique_value_prop", "Unique value proposition"),
+    ("uvp_proof", "Proof"),
+    ("other_uvp_desc", "Proof"),
+    ("lead_magnet_desc", "Lead magnet"),
+)
+TICKET_ITEM_LABELS = (
+    ("features_desc", "Features"),
+    ("benefits", "Benefits"),
+)
+PLACEHOLDER_PREFIX = "Example:"
+
+
+def _clean(value):
+    if value is None:
+        return None
+    text = str(value).strip()
+    if not text or text.startswith(PLACEHOLDER_PREFIX):
+        return None
+    # Multi-line lists ("- item" per line) become one "item; item" line
+    lines = (" ".join(line.split()).lstrip("-*• ") for line in text.splitlines())
+    return "; ".join(line for line in lines if line)
+
+
+def _offer_line(index, item):
+    name = _clean(item.get("product_name")) or f"Offer {index}"
+    details = [
+        detail
+        for detail in (
+            _clean(item.get("product_type")),
+            (
+                f"${str(item['price']).lstrip('$')}"
+                if item.get("price") not in (None, "")
+                else None
+            ),
+        )
+        if detail
+    ]
+    lines = [f"{index}. {name}" + (f" ({', '.join(details)})" if details else "")]
+    for key, label in TICKET_ITEM_LABELS:
+        text = _clean(item.get(key))
+        if text:
+            lines.append(f"   {label}: {text}")
+    return lines
+
+
+def _price(item):
+    # "$1,299.00" -> 1299.0; offers without a readable price sort last
+    match = re.search(r"\d+(?:\.\d+)?", str(item.get("price") or "").replace(",", ""))
+    return (match is None, float(match.group()) if match else 0.0)
+
+
+@lru_cache(maxsize=1024)
+def _serialize(row_json):
+    row = json.loads(row_json)
+    lines = []
+    seen_labels = set()
+    for key, label in SUBMISSION_LABELS:
+        text = _clean(row.get(key))
+        if text and label not in seen_labels:
+            lines.append(f"{label}: {text}")
+            seen_labels.add(label)
+
+    ticket_items = row.get("ticket_items") or []
+    if isinstance(ticket_items, str):
+        ticket_items = json.loads(ticket_items)
+    if ticket_items:
+        lines.append("Offers, lowest to highest price:")
+        ticket_items = sorted(ticket_items, key=_price)
+        for index, item in enumerate(ticket_items, start=1):
+            lines.extend(_offer_line(index, item))
+    return "\n".join(lines)
+
+
+def serialize_submission(row):
+    # Cached per row version: identical row contents hit the same entry. Also
+    # a dsp field format handler, which renders the "Follow the following
+    # format" guidelines by passing the field's description; anything that
+    # isn't a row is rendered as text, like dsp's default.
+    if not isinstance(row, Mapping):
+        return str(row)
+    return _serialize(json.dumps(dict(row), sort_keys=True, default=str))
+
+
+def serialize_context(context):
+    # BusinessAnalysis context: the submission plus optional extra user input
+    if not isinstance(context, Mapping):
+        return str(context)
+    text = serialize_submission(context["row_data"])
+    additional_input = _clean(context.get("additional_input"))
+    if additional_input:
+        text += f"\nAdditional context: {additional_input}"
+    return text
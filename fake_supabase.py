@@ -0,0 +1,404 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from questionnaire_schema import SCHEMA
+
+logger = logging.getLogger(__name__)
+
+# A PostgREST-compatible stand-in for the Supabase tables the apps use, backed
+# by SQLite, so supabase-py can be pointed at it with SUPABASE_URL. Implements
+# the subset of the REST API postgrest-py sends: select, eq/neq/gt/gte/lt/lte/
+# in/is filters, order, limit/offset, insert, upsert (on_conflict), update and
+# delete.
+FAKE_SUPABASE_HOST = os.getenv("FAKE_SUPABASE_HOST", "127.0.0.1")
+FAKE_SUPABASE_PORT = int(os.getenv("FAKE_SUPABASE_PORT", "54321"))
+FAKE_SUPABASE_DB = os.getenv("FAKE_SUPABASE_DB", ":memory:")
+
+# Table -> columns with a unique index, used to resolve upsert conflicts
+TABLES = {
+    "form_submissions": ("email",),
+    "business_summaries": ("email",),
+    "llm_outputs": (),
+}
+
+# supabase-py only accepts JWT-shaped keys; this one is never verified
+FAKE_SUPABASE_KEY = "fake.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.local"
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _literal(value):
+    if value == "null":
+        return None
+    if value in ("true", "false"):
+        return value == "true"
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _column(name):
+    if not name.replace("_", "").isalnum():
+        raise RequestError(400, f"invalid column {name!r}")
+    return "id" if name == "id" else f"json_extract(data, '$.{name}')"
+
+
+OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def _where(filters):
+    # filters: [(column, "op.value"), ...] as postgrest-py encodes them
+    clauses, params = [], []
+    for column, expression in filters:
+        op, _, value = expression.partition(".")
+        negate = op == "not"
+        if negate:
+            op, _, value = value.partition(".")
+        if op in OPERATORS:
+            clause = f"{_column(column)} {OPERATORS[op]} ?"
+            params.append(_literal(value))
+        elif op == "in":
+            values = [_literal(v.strip('"')) for v in value.strip("()").split(",")]
+            clause = f"{_column(column)} in ({', '.join('?' * len(values))})"
+            params.extend(values)
+        elif op == "is" and value in ("null", "true", "false"):
+            clause = f"{_column(column)} is {value}"
+        else:
+            raise RequestError(400, f"unsupported operator {op!r}")
+        clauses.append(f"not ({clause})" if negate else clause)
+    return (" where " + " and ".join(clauses)) if clauses else "", params
+
+
+def _order(order):
+    # "created_at.desc,id" -> order by ...
+    terms = []
+    for term in order.split(","):
+        column, *modifiers = term.split(".")
+        direction = "desc" if "desc" in modifiers else "asc"
+        terms.append(f"{_column(column)} {direction}")
+    return " order by " + ", ".join(terms)
+
+
+class FakeDatabase:
+    def __init__(self, path=FAKE_SUPABASE_DB):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            for table, unique_columns in TABLES.items():
+                self._conn.execute(
+                    f"create table if not exists {table} "
+                    "(id integer primary key autoincrement, data text not null)"
+                )
+                self._conn.execute(
+                    f"create index if not exists {table}_email "
+                    f"on {table} (json_extract(data, '$.email'))"
+                )
+                for column in unique_columns:
+                    self._conn.execute(
+                        f"create unique index if not exists {table}_{column}_key "
+                        f"on {table} (json_extract(data, '$.{column}'))"
+                    )
+
+    @staticmethod
+    def _table(table):
+        if table not in TABLES:
+            raise RequestError(404, f"relation {table!r} does not exist")
+        return table
+
+    @staticmethod
+    def _row(row_id, data, columns):
+        row = {"id": row_id, **json.loads(data)}
+        if columns == ["*"]:
+            return row
+        return {column: row.get(column) for column in columns}
+
+    def select(self, table, columns, filters, order=None, limit=None, offset=None):
+        where, params = _where(filters)
+        sql = f"select id, data from {self._table(table)}{where}"
+        sql += _order(order) if order else " order by id"
+        if limit is not None:
+            sql += f" limit {int(limit)}"
+            if offset is not None:
+                sql += f" offset {int(offset)}"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row(row_id, data, columns) for row_id, data in rows]
+
+    def count(self, table, filters):
+        where, params = _where(filters)
+        with self._lock:
+            sql = f"select count(*) from {self._table(table)}{where}"
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def insert(self, table, rows, on_conflict=None, merge=False):
+        table = self._table(table)
+        now = datetime.now(timezone.utc).isoformat()
+        stored = []
+        with self._lock, self._conn:
+            for row in rows:
+                row = dict(row)
+                row_id = row.pop("id", None)
+                existing = None
+                if merge:
+                    key = on_conflict or "id"
+                    value = row_id if key == "id" else row.get(key)
+                    if value is not None:
+                        existing = self._conn.execute(
+                            f"select id, data from {table} where {_column(key)} = ?",
+                            (value,),
+                        ).fetchone()
+                if existing:
+                    row_id = existing[0]
+                    data = {**json.loads(existing[1]), **row, "updated_at": now}
+                    self._conn.execute(
+                        f"update {table} set data = ? where id = ?",
+                        (json.dumps(data), row_id),
+                    )
+                else:
+                    data = {"created_at": now, "updated_at": now, **row}
+                    try:
+                        cursor = self._conn.execute(
+                            f"insert into {table} (id, data) values (?, ?)",
+                            (row_id, json.dumps(data)),
+                        )
+                    except sqlite3.IntegrityError as error:
+                        raise RequestError(409, f"duplicate key: {error}")
+                    row_id = cursor.lastrowid
+                stored.append({"id": row_id, **data})
+        return stored
+
+    def update(self, table, values, filters):
+        rows = self.select(table, ["*"], filters)
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock, self._conn:
+            for row in rows:
+                row.update(values, updated_at=now)
+                row_id = row.pop("id")
+                self._conn.execute(
+                    f"update {table} set data = ? where id = ?",
+                    (json.dumps(row), row_id),
+                )
+                row["id"] = row_id
+        return rows
+
+    def delete(self, table, filters):
+        rows = self.select(table, ["*"], filters)
+        where, params = _where(filters)
+        with self._lock, self._conn:
+            self._conn.execute(f"delete from {table}{where}", params)
+        return rows
+
+
+class PostgrestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    database = None
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def _parse(self):
+        url = urlsplit(self.path)
+        prefix = "/rest/v1/"
+        if not url.path.startswith(prefix):
+            raise RequestError(404, f"unknown path {url.path}")
+        table = url.path[len(prefix) :].strip("/")
+        params = {}
+        filters = []
+        for key, value in parse_qsl(url.query, keep_blank_values=True):
+            if key in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                params[key] = value
+            else:
+                filters.append((key, value))
+        return table, params, filters
+
+    def _read_body(self):
+        # Read whatever the request carries, whatever the method: postgrest-py
+        # sends GET and HEAD with a "{}" body, and leaving it unread on a
+        # keep-alive connection corrupts the next request
+        length = int(self.headers.get("Content-Length") or 0)
+        self._raw_body = self.rfile.read(length) if length else b""
+
+    def _body(self):
+        return json.loads(self._raw_body or b"null")
+
+    def _prefer(self):
+        return {
+            part.strip()
+            for part in self.headers.get("Prefer", "").split(",")
+            if part.strip()
+        }
+
+    def _respond(self, status, rows=None, total=None):
+        single = "vnd.pgrst.object" in self.headers.get("Accept", "")
+        if single:
+            if rows is None or len(rows) != 1:
+                return self._error(406, f"expected 1 row, got {len(rows or [])}")
+            payload = rows[0]
+        else:
+            payload = rows if rows is not None else []
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        count = len(rows or [])
+        span = f"0-{count - 1}" if count else "*"
+        self.send_header("Content-Range", f"{span}/{'*' if total is None else total}")
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status, message):
+        body = json.dumps({"message": message, "code": str(status)}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _handle(self, method):
+        self._read_body()
+        try:
+            table, params, filters = self._parse()
+            prefer = self._prefer()
+            representation = "return=representation" in prefer
+            if method == "GET":
+                columns = [c.strip() for c in params.get("select", "*").split(",")]
+                rows = self.database.select(
+                    table,
+                    columns,
+                    filters,
+                    params.get("order"),
+                    params.get("limit"),
+                    params.get("offset"),
+                )
+                total = None
+                if "count=exact" in prefer:
+                    total = self.database.count(table, filters)
+                return self._respond(200, rows, total)
+            if method == "POST":
+                body = self._body()
+                rows = body if isinstance(body, list) else [body]
+                stored = self.database.insert(
+                    table,
+                    rows,
+                    on_conflict=params.get("on_conflict"),
+                    merge="resolution=merge-duplicates" in prefer,
+                )
+                return self._respond(201, stored if representation else None)
+            if method == "PATCH":
+                rows = self.database.update(table, self._body(), filters)
+                return self._respond(200, rows if representation else None)
+            if method == "DELETE":
+                rows = self.database.delete(table, filters)
+                return self._respond(200, rows if representation else None)
+        except RequestError as error:
+            return self._error(error.status, str(error))
+        except (ValueError, sqlite3.Error) as error:
+            return self._error(400, str(error))
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_HEAD(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+def fake_submission(index, rng):
+    # A plausible questionnaire row, deterministic for a given index and seed,
+    # in the shape llm3lit saves: ticket_order lists the schema's ticket names,
+    # cheapest first, and ticket_items follow that order
+    audiences = ("busy parents", "freelance designers", "indie SaaS founders")
+    offers = ("course", "coaching", "template pack", "membership")
+    items = [
+        {
+            "product_name": f"{rng.choice(offers).title()} {tier}",
+            "product_type": rng.choice(offers),
+            "price": price,
+            "features_desc": "- weekly calls\n- private community\n- templates",
+            "benefits": "- save 5 hours a week\n- launch in 30 days",
+        }
+        for tier, price in enumerate(sorted(rng.sample(range(19, 2000), 3)), start=1)
+    ]
+    return {
+        "email": f"user{index}@example.com",
+        "avatar_desc": f"{rng.choice(audiences)} who want more clients",
+        "avatar_pain_list": "- no time\n- inconsistent leads\n- unclear offer",
+        "unique_value_prop": "Done-with-you funnels that launch in a weekend",
+        "uvp_type": rng.choice(("Fastest", "Cheapest", "Most personal")),
+        "uvp_proof": "120 launches, 4.9/5 average rating",
+        "lead_magnet_desc": "Free 7-day funnel email course",
+        "num_ticket_items": len(items),
+        "ticket_order": list(SCHEMA.repeat_group.names[: len(items)]),
+        "ticket_items": items,
+    }
+
+
+def seed(database, count, random_seed=0):
+    rng = random.Random(random_seed)
+    rows = [fake_submission(index, rng) for index in range(count)]
+    database.insert("form_submissions", rows, on_conflict="email", merge=True)
+
+
+def serve(host=FAKE_SUPABASE_HOST, port=FAKE_SUPABASE_PORT, database=None):
+    # Starts the server on a daemon thread and returns it; server.server_address
+    # has the bound port when port=0
+    handler = type(
+        "Handler", (PostgrestHandler,), {"database": database or FakeDatabase()}
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local PostgREST stand-in")
+    parser.add_argument("--host", default=FAKE_SUPABASE_HOST)
+    parser.add_argument("--port", type=int, default=FAKE_SUPABASE_PORT)
+    parser.add_argument("--db", default=FAKE_SUPABASE_DB, help="SQLite path")
+    parser.add_argument("--seed", type=int, default=0, help="fake submissions")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    database = FakeDatabase(args.db)
+    if args.seed:
+        seed(database, args.seed)
+    server = serve(args.host, args.port, database)
+    host, port = server.server_address
+    print(f"SUPABASE_URL=http://{host}:{port}")
+    print(f"SUPABASE_KEY={FAKE_SUPABASE_KEY}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# An OpenAI-compatible /chat/completions endpoint standing in for Unify, so
+# UNIFY_API_BASE can point at a laptop. Time to first token is drawn from a
+# lognormal distribution and tokens are then streamed at a fixed rate. Draws
+# come from a seeded generator, so a replay sees the same latencies every run.
+FAKE_UNIFY_HOST = os.getenv("FAKE_UNIFY_HOST", "127.0.0.1")
+FAKE_UNIFY_PORT = int(os.getenv("FAKE_UNIFY_PORT", "8787"))
+FAKE_UNIFY_SEED = int(os.getenv("FAKE_UNIFY_SEED", "0"))
+
+# Defaults for every model; FAKE_UNIFY_PROFILES (JSON, model -> overrides)
+# gives individual models their own latency, speed and error rate
+DEFAULT_PROFILE = {
+    "ttft_median_s": float(os.getenv("FAKE_UNIFY_TTFT_MEDIAN_S", "0.4")),
+    "ttft_sigma": float(os.getenv("FAKE_UNIFY_TTFT_SIGMA", "0.5")),
+    "tokens_per_s": float(os.getenv("FAKE_UNIFY_TOKENS_PER_S", "80")),
+    "completion_tokens": int(os.getenv("FAKE_UNIFY_COMPLETION_TOKENS", "300")),
+    "error_rate": float(os.getenv("FAKE_UNIFY_ERROR_RATE", "0")),
+}
+PROFILES = json.loads(os.getenv("FAKE_UNIFY_PROFILES", "{}"))
+
+WORDS = (
+    "clients launch offer funnel proof value weekly growth simple clear "
+    "trusted results audience story promise email course page price"
+).split()
+
+
+class LatencyModel:
+    def __init__(self, profiles=None, default=None, seed=FAKE_UNIFY_SEED):
+        self.default = dict(DEFAULT_PROFILE, **(default or {}))
+        self.profiles = PROFILES if profiles is None else profiles
+        self.seed = seed
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def profile(self, model):
+        return {**self.default, **self.profiles.get(model, {})}
+
+    def draw(self, model):
+        # The nth request to a model always gets the same draw for a seed
+        with self._lock:
+            index = self._counts.get(model, 0)
+            self._counts[model] = index + 1
+        profile = self.profile(model)
+        rng = random.Random(f"{self.seed}:{model}:{index}")
+        return {
+            "fail": rng.random() < profile["error_rate"],
+            "ttft_s": profile["ttft_median_s"]
+            * rng.lognormvariate(0.0, profile["ttft_sigma"]),
+            "token_interval_s": 1.0 / profile["tokens_per_s"],
+            "tokens": [rng.choice(WORDS) for _ in range(profile["completion_tokens"])],
+        }
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = None
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        if not urlsplit(self.path).path.endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": "not found"}})
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        model = request.get("model", "fake")
+        draw = self.latency.draw(model)
+
+        time.sleep(draw["ttft_s"])
+        if draw["fail"]:
+            return self._json(503, {"error": {"message": f"{model} unavailable"}})
+
+        tokens = draw["tokens"][: request.get("max_tokens") or None]
+        prompt_tokens = sum(
+            len(str(message.get("content", "")).split())
+            for message in request.get("messages", [])
+        )
+        completion_id = f"chatcmpl-fake-{time.monotonic_ns()}"
+        if not request.get("stream"):
+            time.sleep(draw["token_interval_s"] * len(tokens))
+            return self._json(
+                200,
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {
+                                "role": "assistant",
+                                "content": " ".join(tokens),
+                            },
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(tokens),
+                        "total_tokens": prompt_tokens + len(tokens),
+                    },
+                },
+            )
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for index, token in enumerate(tokens + [None]):
+                delta = {"content": token if index == 0 else f" {token}"}
+                event = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "delta": {} if token is None else delta,
+                            "finish_reason": "stop" if token is None else None,
+                        }
+                    ],
+                }
+                self._chunk(f"data: {json.dumps(event)}\n\n".encode())
+                if token is not None:
+                    time.sleep(draw["token_interval_s"])
+            self._chunk(b"data: [DONE]\n\n")
+            self._chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early, e.g. a losing hedge
+            self.close_connection = True
+
+
+def serve(host=FAKE_UNIFY_HOST, port=FAKE_UNIFY_PORT, latency=None):
+    # Starts the server on a daemon thread and returns it; server.server_address
+    # has the bound port when port=0
+    handler = type("Handler", (ChatHandler,), {"latency": latency or LatencyModel()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Unify/OpenAI stand-in")
+    parser.add_argument("--host", default=FAKE_UNIFY_HOST)
+    parser.add_argument("--port", type=int, default=FAKE_UNIFY_PORT)
+    parser.add_argument("--seed", type=int, default=FAKE_UNIFY_SEED)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = serve(args.host, args.port, LatencyModel(seed=args.seed))
+    host, port = server.server_address
+    print(f"UNIFY_API_BASE=http://{host}:{port}/v0/")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
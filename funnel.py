@@ -0,0 +1,52 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import dspy
+
+from context_serializer import serialize_submission
+from funnel_template import load_template
+from streaming import StreamingPredict
+
+FUNNEL_MAX_CONCURRENCY = int(os.getenv("FUNNEL_MAX_CONCURRENCY", "6"))
+
+
+class FunnelSection(dspy.Signature):
+    """Write the copy for one section of a landing page funnel, filling in every field of the section template in the brand's voice"""
+
+    form_data = dspy.InputField(
+        desc="Business Background and details coming from Supabase form data",
+        format=serialize_submission,
+    )
+    section = dspy.InputField(desc="The funnel section to write")
+    section_template = dspy.InputField(
+        desc="The fields of the section, one per line, to fill in"
+    )
+    section_copy = dspy.OutputField(
+        desc="The section template with every field filled in with finished copy"
+    )
+
+
+def generate_funnel(
+    row_data, lm, max_concurrency=FUNNEL_MAX_CONCURRENCY, force=False, template=None
+):
+    # One LLM call per template section, all in flight at once up to
+    # max_concurrency. Yields (section, copy) as sections finish, so end-to-end
+    # latency is bounded by the slowest section rather than the sum of all of
+    # them. Worker threads don't see the script thread's dspy settings, hence
+    # the explicit lm.
+    template = load_template() if template is None else template
+    generate_section = StreamingPredict(FunnelSection, lm=lm)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = {
+            executor.submit(
+                generate_section,
+                force=force,
+                tags={"topic": section.heading},
+                form_data=row_data,
+                section=section.heading,
+                section_template=section.render(),
+            ): section
+            for section in template.sections
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result().section_copy
@@ -0,0 +1,200 @@
+import glob
+import os
+import re
+import threading
+from dataclasses import dataclass
+
+FUNNEL_TEMPLATE_PATH = os.getenv("FUNNEL_TEMPLATE_PATH", "standardfunneltemplate.txt")
+
+_SECTION_HEADING = re.compile(r"^Section (\d+): (.+)$")
+_NUMBERED_LABEL = re.compile(r"^(.*?)\s*(\d+)$")
+
+
+@dataclass(frozen=True)
+class TemplateField:
+    label: str
+    hint: str = ""
+
+    def render(self, label=None):
+        label = label or self.label
+        return f"{label}: {self.hint}" if self.hint else f"{label}:"
+
+
+@dataclass(frozen=True)
+class RepeatGroup:
+    # A run of slots that repeats, e.g. "Number:/Description:" three times or
+    # "Benefit 1" to "Benefit 5"
+    fields: tuple
+    count: int
+
+    @property
+    def labels(self):
+        return tuple(
+            f"{field.label} {i}"
+            for i in range(1, self.count + 1)
+            for field in self.fields
+        )
+
+    def render(self):
+        return "\n".join(
+            field.render(f"{field.label} {i}")
+            for i in range(1, self.count + 1)
+            for field in self.fields
+        )
+
+
+@dataclass(frozen=True)
+class TemplateSection:
+    heading: str
+    title: str
+    number: int
+    items: tuple
+
+    @property
+    def labels(self):
+        labels = []
+        for item in self.items:
+            if isinstance(item, RepeatGroup):
+                labels.extend(item.labels)
+            else:
+                labels.append(item.label)
+        return tuple(labels)
+
+    def render(self):
+        # The section's slots, one per line, as handed to the generator
+        return "\n".join(item.render() for item in self.items)
+
+    def missing_labels(self, copy):
+        # Slots the generated copy didn't fill in
+        return [label for label in self.labels if label.lower() not in copy.lower()]
+
+
+@dataclass(frozen=True)
+class FunnelTemplate:
+    name: str
+    path: str
+    mtime: float
+    sections: tuple
+
+    def section(self, heading):
+        for section in self.sections:
+            if section.heading == heading or section.title == heading:
+                return section
+        raise KeyError(heading)
+
+    def assemble(self, copies):
+        # Join generated copy back together in template order
+        return "\n\n".join(
+            f"{section.heading}\n\n{copies[section.heading]}"
+            for section in self.sections
+            if section.heading in copies
+        )
+
+
+def _parse_field(line):
+    label, _, hint = line.partition(":")
+    return TemplateField(label.strip(), hint.strip().rstrip(":").strip())
+
+
+def _group_repeats(fields):
+    items = []
+    i = 0
+    while i < len(fields):
+        # Numbered run: "Benefit 1", "Benefit 2", ...
+        match = _NUMBERED_LABEL.match(fields[i].label)
+        if match and match.group(2) == "1":
+            stem = match.group(1)
+            count = 1
+            while (
+                i + count < len(fields)
+                and fields[i + count].label == f"{stem} {count + 1}"
+                and not fields[i + count].hint
+            ):
+                count += 1
+            if count > 1 and not fields[i].hint:
+                items.append(RepeatGroup((TemplateField(stem),), count))
+                i += count
+                continue
+
+        # Repeated block of labels: "Number", "Description", "Number", ...
+        grouped = False
+        for width in range(1, (len(fields) - i) // 2 + 1):
+            block = [field.label for field in fields[i : i + width]]
+            count = 1
+            while [
+                field.label
+                for field in fields[i + count * width : i + (count + 1) * width]
+            ] == block:
+                count += 1
+            if count > 1:
+                items.append(RepeatGroup(tuple(fields[i : i + width]), count))
+                i += count * width
+                grouped = True
+                break
+        if not grouped:
+            items.append(fields[i])
+            i += 1
+    return tuple(items)
+
+
+def compile_template(text, name="standard", path="", mtime=0.0):
+    sections = []
+    heading = None
+    lines = []
+
+    def close_section():
+        if heading is None:
+            return
+        match = _SECTION_HEADING.match(heading)
+        if match:
+            number, title = int(match.group(1)), match.group(2)
+        else:
+            number, title = 0, heading
+        fields = [_parse_field(line) for line in lines]
+        sections.append(TemplateSection(heading, title, number, _group_repeats(fields)))
+
+    blank_run = 0
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            blank_run += 1
+            continue
+        # "Section N: Title", or a bare "Title:" line set off by two or more
+        # blank lines, like "Calendar Reminder:"
+        if _SECTION_HEADING.match(line) or (
+            blank_run >= 2 and line.endswith(":") and ":" not in line[:-1]
+        ):
+            close_section()
+            heading = line.rstrip(":")
+            lines = []
+        else:
+            lines.append(line)
+        blank_run = 0
+    close_section()
+    return FunnelTemplate(name, path, mtime, tuple(sections))
+
+
+# Compiled templates by path, rebuilt only when the file's mtime changes
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def load_template(path=FUNNEL_TEMPLATE_PATH):
+    mtime = os.stat(path).st_mtime
+    with _compiled_lock:
+        template = _compiled.get(path)
+        if template is None or template.mtime != mtime:
+            with open(path) as f:
+                name = os.path.basename(path).removesuffix(".txt")
+                template = compile_template(f.read(), name, path, mtime)
+            _compiled[path] = template
+        return template
+
+
+def available_templates(directory=None):
+    # standardfunneltemplate.txt plus any other *template.txt next to it
+    directory = directory or os.path.dirname(os.path.abspath(FUNNEL_TEMPLATE_PATH))
+    return {
+        os.path.basename(path).removesuffix(".txt"): path
+        for path in sorted(glob.glob(os.path.join(directory, "*template.txt")))
+    }
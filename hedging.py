@@ -0,0 +1,226 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+import openai
+
+from model_router import ROUTER_WINDOW, RouterLM, is_failover_error, percentile
+
+logger = logging.getLogger(__name__)
+
+# Hard per-call deadline, and when to fire a second, hedged request: "p90"
+# hedges once the primary has taken longer than its model's p90 latency, a
+# number hedges after that many seconds, "off" disables hedging
+LLM_DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "120"))
+LLM_HEDGE_AFTER = os.getenv("LLM_HEDGE_AFTER", "p90")
+LLM_HEDGE_DEFAULT_S = float(os.getenv("LLM_HEDGE_DEFAULT_S", "8"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "10"))
+
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def is_timeout_error(error):
+    return isinstance(error, (openai.APITimeoutError, httpx.TimeoutException))
+
+
+class HedgeMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.hedges_fired = 0
+        self.hedge_wins = 0
+        self.deadlines_exceeded = 0
+        self.latency_saved_s = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedges_fired": self.hedges_fired,
+                "hedge_rate": self.hedges_fired / self.calls if self.calls else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "deadlines_exceeded": self.deadlines_exceeded,
+                "latency_saved_s": round(self.latency_saved_s, 3),
+            }
+
+
+hedge_metrics = HedgeMetrics()
+
+
+class ModelLatencies:
+    # Time to open a response, per model, for every LM hedged_call sends to,
+    # routed or not; hedge_delay's p90 comes from here
+    def __init__(self, window=ROUTER_WINDOW):
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def add(self, model, latency):
+        with self._lock:
+            self._latencies[model].append(latency)
+
+    def p90(self, model):
+        with self._lock:
+            latencies = list(self._latencies.get(model, ()))
+        if len(latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return percentile(latencies, 0.9)
+
+
+model_latencies = ModelLatencies()
+
+
+def hedge_delay(backend):
+    if LLM_HEDGE_AFTER == "off":
+        return None
+    if LLM_HEDGE_AFTER != "p90":
+        return float(LLM_HEDGE_AFTER)
+    p90 = model_latencies.p90(backend.kwargs["model"])
+    return LLM_HEDGE_DEFAULT_S if p90 is None else p90
+
+
+def _timed(attempt, backend, timeout):
+    started = time.monotonic()
+    result = attempt(backend, timeout)
+    return result, started, time.monotonic()
+
+
+def hedged_call(attempt, lm, deadline_s=LLM_DEADLINE_S, close=lambda result: None):
+    # attempt(backend, timeout) performs one request, giving up after timeout
+    # seconds, the budget left before the deadline. With a RouterLM the
+    # backends are tried fastest first, failing over on errors; a plain LM is
+    # hedged against itself. Returns (backend, result) from the first success.
+    router = lm if isinstance(lm, RouterLM) else None
+    backends = router.ranked_backends() if router else [lm]
+    delay = hedge_delay(backends[0])
+    queue = list(backends)
+    if delay is not None and len(queue) == 1:
+        queue.append(backends[0])
+
+    started = time.monotonic()
+    pending = {}
+    hedge = None
+    last_error = None
+    hedge_metrics.add(calls=1)
+    decision = {
+        "at": time.time(),
+        "ranking": [backend.kwargs["model"] for backend in backends],
+        "hedge_after_s": delay,
+        "attempts": [],
+    }
+
+    def record(backend, latency, ok):
+        if ok:
+            model_latencies.add(backend.kwargs["model"], latency)
+        if router:
+            router.record(backend, latency, ok)
+
+    def launch():
+        backend = queue.pop(0)
+        timeout = max(0.0, started + deadline_s - time.monotonic())
+        future = _executor.submit(_timed, attempt, backend, timeout)
+        pending[future] = backend
+        return future
+
+    def discard_when_done(future, backend, won_at=None):
+        # A losing request can't be interrupted mid-flight; close whatever it
+        # returns as soon as it arrives, and still count its latency, so a
+        # backend that keeps losing to the hedge is ranked and hedged as slow.
+        # When the hedge won, the gap between the two finishing is latency the
+        # hedge saved.
+        decision["attempts"].append(
+            {"model": backend.kwargs["model"], "discarded": True}
+        )
+
+        def callback(done):
+            error = done.exception()
+            if error is not None:
+                if is_failover_error(error):
+                    record(backend, time.monotonic() - started, False)
+                return
+            result, launched, finished = done.result()
+            close(result)
+            record(backend, finished - launched, True)
+            if won_at is not None:
+                hedge_metrics.add(latency_saved_s=max(0.0, finished - won_at))
+
+        future.add_done_callback(callback)
+
+    def discard_pending(won_at=None):
+        for loser, backend in pending.items():
+            discard_when_done(loser, backend, won_at)
+
+    try:
+        launch()
+        while pending:
+            now = time.monotonic()
+            remaining = started + deadline_s - now
+            if remaining <= 0:
+                break
+            can_hedge = hedge is None and queue and delay is not None
+            timeout = remaining
+            if can_hedge:
+                timeout = min(timeout, max(0.0, started + delay - now))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if can_hedge and time.monotonic() >= started + delay:
+                    logger.info("hedging after %.2fs", time.monotonic() - started)
+                    hedge_metrics.add(hedges_fired=1)
+                    decision["hedged_at_s"] = time.monotonic() - started
+                    hedge = launch()
+                continue
+
+            for future in done:
+                backend = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    result, launched, finished = future.result()
+                    record(backend, finished - launched, True)
+                    decision["attempts"].append(
+                        {
+                            "model": backend.kwargs["model"],
+                            "latency_s": finished - launched,
+                            "hedge": future is hedge,
+                        }
+                    )
+                    if future is hedge:
+                        hedge_metrics.add(hedge_wins=1)
+                        discard_pending(won_at=finished)
+                    else:
+                        discard_pending()
+                    return backend, result
+
+                record(backend, time.monotonic() - started, False)
+                decision["attempts"].append(
+                    {"model": backend.kwargs["model"], "error": repr(error)}
+                )
+                if not is_failover_error(error):
+                    discard_pending()
+                    raise error
+                # Fail over straight away rather than waiting for the hedge timer
+                last_error = error
+                if queue:
+                    launch()
+
+        discard_pending()
+        if pending or last_error is None or is_timeout_error(last_error):
+            hedge_metrics.add(deadlines_exceeded=1)
+            decision["deadline_exceeded"] = True
+            raise DeadlineExceeded(f"no response within {deadline_s:.0f}s")
+        raise last_error
+    finally:
+        if router:
+            router.log_decision(decision)
@@ -0,0 +1,68 @@
+import os
+
+import streamlit as st
+
+from jobs import FAILED, QUEUED, job_queue
+
+# Shows a generation job enqueued by a page. While the job is queued or
+# running only a fragment reruns, every JOB_UI_POLL_S, reading the job's row;
+# other widgets and reruns of the page leave the job alone. Once it finishes
+# the page reruns once, so the fragment stops polling.
+JOB_UI_POLL_S = float(os.getenv("JOB_UI_POLL_S", "1"))
+
+
+def show_partial_text(job):
+    st.write(job.partial)
+
+
+def job_section(job_id, render_result, render_partial=show_partial_text):
+    # render_result(job) draws a finished job; it runs inside the fragment, so
+    # its buttons rerun only the fragment. render_partial(job) draws the
+    # progress a running job has published in job.partial, whose format
+    # depends on job.kind.
+    job = job_queue.get(job_id)
+    polling = job is not None and job.pending
+    run_every = JOB_UI_POLL_S if polling else None
+    st.fragment(run_every=run_every)(_job_fragment)(
+        job_id, render_result, render_partial, polling
+    )
+
+
+def _job_fragment(job_id, render_result, render_partial, polling):
+    job = job_queue.get(job_id)
+    if job is None:
+        st.warning("This result has expired, please generate it again.")
+    elif job.pending:
+        if job.status == QUEUED:
+            ahead = job_queue.position(job_id)
+            st.info(f"Waiting for a worker ({ahead} ahead in the queue)...")
+        else:
+            st.info("Generating...")
+            if job.partial:
+                render_partial(job)
+    elif polling:
+        st.rerun()
+    elif job.status == FAILED:
+        st.error(job.error)
+    else:
+        render_result(job)
+
+
+def timing_caption(result):
+    if result["cache_hit"]:
+        st.caption("Loaded from the prediction cache")
+    else:
+        st.caption(
+            f"First token after {result['first_token_s']:.1f}s, "
+            f"complete after {result['total_s']:.1f}s"
+        )
+
+
+def worker_stats_section():
+    # Routing, hedging and coalescing in each worker.py process that reported
+    # recently; generation happens there, not in the page's process
+    stats = job_queue.worker_stats()
+    if stats:
+        st.json(stats)
+    else:
+        st.caption("No worker has reported recently.")
@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+# Persistent queue of generation jobs, shared by the Streamlit pages (which
+# enqueue and poll) and worker.py (which runs them). A job outlives the script
+# run that enqueued it, so a rerun only re-reads its row. Enqueueing the same
+# kind and payload while an identical job is still queued or running returns
+# that job instead of starting another.
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.sqlite3")
+# A running job whose worker has posted neither progress nor a heartbeat for
+# this long is taken for dead and requeued. Workers heartbeat every
+# JOB_HEARTBEAT_S (worker.py) however long the job runs, so this only needs to
+# sit well above that interval.
+JOB_TIMEOUT_S = float(os.getenv("JOB_TIMEOUT_S", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+# Finished jobs are kept this long so pages can still show their result
+JOB_RETENTION_S = float(os.getenv("JOB_RETENTION_S", str(24 * 3600)))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def job_key(kind, payload):
+    # Identical requests share a key, and so an in-flight job
+    data = json.dumps(
+        {"kind": kind, "payload": payload},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    payload: dict
+    status: str
+    result: dict = None
+    partial: str = None
+    error: str = None
+    attempts: int = 0
+    created_at: float = None
+    started_at: float = None
+    finished_at: float = None
+    # Worker holding the job while it runs
+    worker: str = None
+
+    @property
+    def pending(self):
+        return self.status in (QUEUED, RUNNING)
+
+
+_COLUMNS = (
+    "id, kind, payload, status, result, partial, error, attempts, "
+    "created_at, started_at, finished_at, worker"
+)
+
+
+def _job(row):
+    if row is None:
+        return None
+    job = Job(*row)
+    job.payload = json.loads(job.payload)
+    job.result = json.loads(job.result) if job.result else None
+    return job
+
+
+class JobQueue:
+    def __init__(self, path=JOBS_DB_PATH, timeout_s=JOB_TIMEOUT_S):
+        self.path = path
+        self.timeout_s = timeout_s
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute(
+            """
+            create table if not exists jobs (
+                id text primary key,
+                kind text not null,
+                key text not null,
+                payload text not null,
+                status text not null,
+                result text,
+                partial text,
+                error text,
+                attempts integer not null default 0,
+                worker text,
+                created_at real not null,
+                started_at real,
+                updated_at real not null,
+                finished_at real
+            )
+            """
+        )
+        # At most one queued or running job per key
+        self._conn.execute(
+            "create unique index if not exists jobs_active_key on jobs (key) "
+            f"where status in ('{QUEUED}', '{RUNNING}')"
+        )
+        self._conn.execute(
+            "create index if not exists jobs_status_created_at "
+            "on jobs (status, created_at)"
+        )
+        # Each worker's latest routing, hedging and coalescing stats, so the
+        # pages can show what happens in the worker processes
+        self._conn.execute(
+            """
+            create table if not exists worker_stats (
+                worker text primary key,
+                stats text not null,
+                updated_at real not null
+            )
+            """
+        )
+        self._conn.commit()
+
+    def enqueue(self, kind, payload):
+        key = job_key(kind, payload)
+        now = time.time()
+        with self._lock:
+            try:
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "insert into jobs (id, kind, key, payload, status, created_at, "
+                    "updated_at) values (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, key, json.dumps(payload), QUEUED, now, now),
+                )
+            except sqlite3.IntegrityError:
+                # Already queued or running
+                (job_id,) = self._conn.execute(
+                    "select id from jobs where key = ? and status in (?, ?)",
+                    (key, QUEUED, RUNNING),
+                ).fetchone()
+            self._conn.commit()
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                f"select {_COLUMNS} from jobs where id = ?", (job_id,)
+            ).fetchone()
+        return _job(row)
+
+    def position(self, job_id):
+        # Queued jobs ahead of this one
+        with self._lock:
+            (ahead,) = self._conn.execute(
+                "select count(*) from jobs where status = ? and created_at < "
+                "(select created_at from jobs where id = ?)",
+                (QUEUED, job_id),
+            ).fetchone()
+        return ahead
+
+    def claim(self, worker):
+        # Oldest queued job, marked running for this worker; None if idle. The
+        # status condition on the update keeps two workers from both taking it.
+        while True:
+            now = time.time()
+            with self._lock:
+                row = self._conn.execute(
+                    "select id from jobs where status = ? order by created_at limit 1",
+                    (QUEUED,),
+                ).fetchone()
+                if row is None:
+                    self._conn.commit()
+                    return None
+                claimed = self._conn.execute(
+                    "update jobs set status = ?, worker = ?, started_at = ?, "
+                    "updated_at = ?, attempts = attempts + 1 "
+                    "where id = ? and status = ?",
+                    (RUNNING, worker, now, now, row[0], QUEUED),
+                ).rowcount
+                self._conn.commit()
+            if claimed:
+                return self.get(row[0])
+
+    # The updates below only apply while `worker` still holds the job: once
+    # it has been requeued, and maybe claimed by another worker, they change
+    # nothing and return False, i.e. the worker lost its lease.
+
+    def progress(self, job_id, worker, partial):
+        # Text generated so far, for pages to show while the job runs
+        return self._update(job_id, worker, "partial = ?", partial)
+
+    def heartbeat(self, job_id, worker):
+        # Marks a running job as still alive while it has nothing to publish
+        return self._update(job_id, worker)
+
+    def finish(self, job_id, worker, result):
+        return self._finish(job_id, worker, DONE, result=json.dumps(result))
+
+    def fail(self, job_id, worker, error):
+        return self._finish(job_id, worker, FAILED, error=error)
+
+    def _finish(self, job_id, worker, status, result=None, error=None):
+        return self._update(
+            job_id,
+            worker,
+            "status = ?, result = ?, error = ?, finished_at = ?",
+            status,
+            result,
+            error,
+            time.time(),
+        )
+
+    def _update(self, job_id, worker, assignments=None, *values):
+        sets = f"{assignments}, updated_at = ?" if assignments else "updated_at = ?"
+        with self._lock:
+            updated = self._conn.execute(
+                f"update jobs set {sets} where id = ? and status = ? and worker = ?",
+                (*values, time.time(), job_id, RUNNING, worker),
+            ).rowcount
+            self._conn.commit()
+        return bool(updated)
+
+    def requeue_stale(self, max_attempts=JOB_MAX_ATTEMPTS):
+        # Running jobs not heard from within timeout_s: their worker died. A
+        # job that is merely slow keeps heartbeating and is left alone.
+        now = time.time()
+        cutoff = now - self.timeout_s
+        with self._lock:
+            failed = self._conn.execute(
+                "update jobs set status = ?, error = ?, updated_at = ?, "
+                "finished_at = ? where status = ? and updated_at < ? "
+                "and attempts >= ?",
+                (FAILED, "worker timed out", now, now, RUNNING, cutoff, max_attempts),
+            ).rowcount
+            requeued = self._conn.execute(
+                "update jobs set status = ?, worker = null, partial = null, "
+                "updated_at = ? where status = ? and updated_at < ?",
+                (QUEUED, now, RUNNING, cutoff),
+            ).rowcount
+            self._conn.commit()
+        return requeued, failed
+
+    def prune(self, retention_s=JOB_RETENTION_S):
+        with self._lock:
+            pruned = self._conn.execute(
+                "delete from jobs where status in (?, ?) and finished_at < ?",
+                (DONE, FAILED, time.time() - retention_s),
+            ).rowcount
+            # Workers that stopped long ago
+            self._conn.execute(
+                "delete from worker_stats where updated_at < ?",
+                (time.time() - retention_s,),
+            )
+            self._conn.commit()
+        return pruned
+
+    def publish_stats(self, worker, stats):
+        with self._lock:
+            self._conn.execute(
+                "insert or replace into worker_stats values (?, ?, ?)",
+                (worker, json.dumps(stats, default=str), time.time()),
+            )
+            self._conn.commit()
+
+    def worker_stats(self, max_age_s=JOB_TIMEOUT_S):
+        # Stats of workers that published within max_age_s, by worker name
+        with self._lock:
+            rows = self._conn.execute(
+                "select worker, stats from worker_stats where updated_at >= ? "
+                "order by worker",
+                (time.time() - max_age_s,),
+            ).fetchall()
+        return {worker: json.loads(stats) for worker, stats in rows}
+
+    def stats(self):
+        with self._lock:
+            counts = dict(
+                self._conn.execute(
+                    "select status, count(*) from jobs group by status"
+                ).fetchall()
+            )
+        return {
+            status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)
+        }
+
+
+job_queue = JobQueue()
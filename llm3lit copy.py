@@ -1,5 +1,6 @@
 import os
 import streamlit as st
+from assets import apply_theme, show_logo
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
@@ -45,55 +46,11 @@ def main():
         layout="centered",
     )
 
-    # Set background color
-    st.markdown(
-        """
-        <style>
-        .stApp {
-            background-color: #989595;
-            color: black;
-            font-family: Arial, sans-serif;
-        }
-        .stHeader {
-            color: #377a81;
-            font-size: 28px;
-            font-weight: bold;
-            margin-bottom: 10px;
-        }
-        .stSubheader {
-            color: #377a81;
-            font-size: 24px;
-            font-weight: bold;
-            margin-bottom: 10px;
-        }
-        .stSectionDesc {
-            color: #555555;
-            margin-bottom: 20px;
-        }
-        .stTextArea, .stTextInput {
-            border-radius: 5px;
-            padding: 10px;
-            background-color: transparent;
-            border: 0px solid #cccccc;
-        }
-        .stButton {
-            background-color: #377a81;
-            color: white;
-            border-radius: 5px;
-            padding: 10px 20px;
-        }
-        .stDivider {
-            border: none;
-            border-top: 1px solid #cccccc;
-            margin: 30px 0;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
+    # Shared stylesheet, cached by the browser
+    apply_theme()
 
     # Add logo
-    st.sidebar.image("logo.png", use_column_width=True)
+    show_logo(st.sidebar)
 
     st.title("Build Your Ascension Model")
 
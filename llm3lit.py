@@ -1,41 +1,40 @@
-import os
 import streamlit as st
-from supabase import create_client, Client
+from assets import apply_theme, show_logo
+from supabase import Client
+from clients import get_supabase
 from dotenv import load_dotenv
+from projections import fetch_projected_submission
+from recorder import recorded
+from questionnaire_form import questionnaire_section
+from rerun_stats import rerun_summary, timed_run
+from submission_cache import refresh_submission, submission_cache
+from validation import validate_payload
 
 load_dotenv()
-# Supabase credentials
-# Accessing the variables
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-# Create a Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Shared, pooled Supabase client
+supabase: Client = get_supabase()
 
 
 def get_form_data_by_email(email):
-    data = supabase.table("form_submissions").select("*").eq("email", email).execute()
-    if data.data:
-        return data.data[0]  # Return the first record that matches the email
-    else:
-        return None  # No data found for the email
+    # Served from the process-wide cache; None when no data found for the email
+    return fetch_projected_submission(supabase, email, "questionnaire")
 
 
 def insert_or_update_form_data(email, form_data):
-    existing_data = get_form_data_by_email(email)
-    if existing_data:
-        # Update existing record
-        updated_data = (
+    # Single round trip: insert, or update the existing row for this email.
+    # Relies on the unique index from migrations/001_form_submissions_email_unique.sql
+    with recorded(
+        "db.upsert", table="form_submissions", on_conflict="email", row=form_data
+    ):
+        result = (
             supabase.table("form_submissions")
-            .update(form_data)
-            .eq("email", email)
+            .upsert(form_data, on_conflict="email")
             .execute()
         )
-        st.success("Form data updated successfully!")
-    else:
-        # Insert new record
-        inserted_data = supabase.table("form_submissions").insert(form_data).execute()
-        st.success("Form data inserted successfully!")
+    stored_row = result.data[0] if result.data else None
+    refresh_submission(email, stored_row)
+    st.success("Form data saved successfully!")
+    return stored_row
 
 
 def main():
@@ -45,283 +44,71 @@ def main():
         layout="centered",
     )
 
-    # Set background color
-    st.markdown(
-        """
-        <style>
-        .stApp {
-            background-color: #989595;
-            color: black;
-            font-family: Arial, sans-serif;
-        }
-        .stHeader {
-            color: #377a81;
-            font-size: 28px;
-            font-weight: bold;
-            margin-bottom: 10px;
-        }
-        .stSubheader {
-            color: #377a81;
-            font-size: 24px;
-            font-weight: bold;
-            margin-bottom: 10px;
-        }
-        .stSectionDesc {
-            color: #555555;
-            margin-bottom: 20px;
-        }
-        .stTextArea, .stTextInput {
-            border-radius: 5px;
-            padding: 10px;
-            background-color: transparent;
-            border: 0px solid #cccccc;
-        }
-        .stButton {
-            background-color: #377a81;
-            color: white;
-            border-radius: 5px;
-            padding: 10px 20px;
-        }
-        .stDivider {
-            border: none;
-            border-top: 1px solid #cccccc;
-            margin: 30px 0;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
+    # Shared stylesheet, cached by the browser
+    apply_theme()
 
     # Add logo
-    st.sidebar.image("logo.png", use_column_width=True)
-
-    st.title("Build Your Ascension Model")
+    show_logo(st.sidebar)
 
-    email = st.text_input("Email Address", key="email")
+    # Submission cache counters, to see how much Supabase traffic is saved
+    with st.sidebar.expander("Cache stats"):
+        st.json(submission_cache.stats())
 
-    # Button to trigger data retrieval
-    if st.button("Get Data"):
-        if email:  # Check if the email is not empty
-            data = get_form_data_by_email(
-                email
-            )  # Call your function with the user's email
-            if data:
-                st.write(data)  # Display the data
-            else:
-                st.write("No data found for the provided email.")
-        else:
-            st.write("Please enter a valid email.")
-
-    st.markdown(
-        '<p class="stSubHeader">Enter the email address you used to sign up to Wellness Code</p>',
-        unsafe_allow_html=True,
-    )
-
-    # Your Business Background
-    st.markdown(
-        '<p class="stHeader">Your Business Background</p>', unsafe_allow_html=True
-    )
-    st.markdown(
-        '<p class="stSectionDesc">Describe your business, target audience, and unique value proposition.</p>',
-        unsafe_allow_html=True,
-    )
+    # Full-script vs fragment runs this session, to see what a change costs
+    with st.sidebar.expander("Rerun stats"):
+        st.json(rerun_summary())
 
-    avatar_desc = st.text_area(
-        "Avatar Description",
-        placeholder="Example: A busy working mom seeking inner peace and balance.",
-        key="avatar_desc",
-    )
-
-    avatar_pain_list = st.text_area(
-        "Avatar Problem/Pain List",
-        placeholder="Example: Lack of time, difficulty balancing work and family, feeling overwhelmed.",
-        key="avatar_pain_list",
-    )
-
-    st.write("")
-    st.markdown(
-        '<p class="stSectionDesc">Pick your unique value proposition.</p>',
-        unsafe_allow_html=True,
-    )
-    uvp_type = st.selectbox(
-        "",
-        [
-            "Cheaper",
-            "Bespoke",
-            "White-Glove",
-            "Luxury",
-            "Niche",
-            "Convenience",
-            "Expertise",
-            "Exclusivity",
-            "Customization",
-            "Other",
-        ],
-        index=2,
-        key="uvp_type",
-    )
-    unique_value_prop = st.text_area(
-        "Unique Value Proposition",
-        placeholder="Example: Our holistic approach combines ancient wisdom with modern mindfulness techniques, tailored specifically for busy professionals seeking inner peace and balance.",
-        key="unique_value_prop",
-    )
-
-    uvp_proof = st.text_area(
-        "What makes you uniquely qualified for this? Share some social proof, some numbers, to generate ethos and belief about your capability and success",
-        key="uvp_proof",
-    )
-
-    st.markdown('<hr class="stDivider">', unsafe_allow_html=True)
-
-    # Your Menu
-    st.markdown('<p class="stHeader">Your Menu</p>', unsafe_allow_html=True)
-    st.markdown(
-        '<p class="stSectionDesc">Describe your offerings, including lead magnets, pricing, and packages.</p>',
-        unsafe_allow_html=True,
-    )
+    st.title("Build Your Ascension Model")
 
-    lead_magnet_desc = st.text_area(
-        "Lead Magnet Description",
-        placeholder="Example: Download our free guided meditation for inner peace.",
-        key="lead_magnet_desc",
-    )
+    lookup_section()
+    questionnaire_section(save_submission)
 
-    st.markdown(
-        '<p class="stSubheader">Number of Offerings</p>', unsafe_allow_html=True
-    )
-    st.markdown(
-        '<p class="stSectionDesc">Select the number of offerings or packages you want to present.</p>',
-        unsafe_allow_html=True,
-    )
-    num_ticket_items = st.number_input(
-        "", min_value=3, max_value=5, value=3, step=1, key="num_ticket_items"
-    )
 
-    ticket_names = ["Low Ticket", "Medium Ticket", "High Ticket"]
-    if num_ticket_items > 3:
-        ticket_names.append("Additional Offer A")
-    if num_ticket_items > 4:
-        ticket_names.append("Additional Offer B")
+@st.fragment
+def lookup_section():
+    # Typing the email or clicking "Get Data" reruns only this fragment; the
+    # result is kept in session_state instead of refetched on later reruns
+    with timed_run("lookup_section"):
+        email = st.text_input("Email Address", key="email")
 
-    st.markdown('<p class="stSubheader">Offer Order</p>', unsafe_allow_html=True)
-    st.markdown(
-        '<p class="stSectionDesc">Drag and drop the offerings to set the order in which they increase in price.</p>',
-        unsafe_allow_html=True,
-    )
-    ticket_order = st.multiselect("", ticket_names, ticket_names, key="ticket_order")
+        # Button to trigger data retrieval
+        if st.button("Get Data"):
+            if email:  # Check if the email is not empty
+                st.session_state["lookup"] = (email, get_form_data_by_email(email))
+            else:
+                st.session_state.pop("lookup", None)
+                st.write("Please enter a valid email.")
 
-    st.markdown('<hr class="stDivider">', unsafe_allow_html=True)
+        lookup_email, data = st.session_state.get("lookup", (None, None))
+        if lookup_email and lookup_email == email:
+            if data:
+                st.write(data)  # Display the data
+            else:
+                st.write("No data found for the provided email.")
 
-    # Ticket Items
-    ticket_items = []
-    for ticket_name in ticket_order:
         st.markdown(
-            f'<p class="stSubheader">{ticket_name} Offer</p>', unsafe_allow_html=True
-        )
-
-        # Product Name
-        st.write(f"Enter the name of your {ticket_name.lower()} offering or package.")
-        product_name = st.text_input(
-            f"{ticket_name} Offer Name",
-            placeholder=f"Example: {ticket_name} Awakening Journey",
-            key=f"product_name_{ticket_name}",
+            '<p class="stSubHeader">Enter the email address you used to sign up to Wellness Code</p>',
+            unsafe_allow_html=True,
         )
 
-        # Product Type
-        st.write(f"Select the type of {ticket_name.lower()} offering or package.")
-        product_type = st.selectbox(
-            f"{ticket_name} Offer Type",
-            [
-                "One time course/document",
-                "Recurring membership/community/club",
-                "One time Hourly Virtual",
-                "One time Hourly Local",
-                "Recurring/Package Hourly Virtual",
-                "Recurring/Package Hourly Local",
-                "One time Project Deliverable",
-                "Recurring Services (Retainer)",
-                "Virtual Experience/Event",
-                "In Person Experience/Event/Retreat",
-                "Other",
-            ],
-            index=0,
-            key=f"product_type_{ticket_name}",
-        )
-
-        # Price
-        st.write(
-            f"Enter the price for {ticket_name} Offer. Use the plus button to increase the price by $50."
-        )
-        price = st.number_input(
-            f"{ticket_name} Offer Price",
-            min_value=0,
-            value=100,
-            step=50,
-            key=f"price_{ticket_name}",
-        )
-
-        # Features/Description
-        st.write(f"Enter the features and description for {ticket_name} Offer.")
-        features_desc = st.text_area(
-            f"{ticket_name} Offer Features/Description",
-            placeholder="Example: - 6 video modules\n- Workbook and guided meditations\n- Private community access",
-            key=f"features_desc_{ticket_name}",
-        )
-
-        # Benefits
-        st.write(f"Enter the benefits for {ticket_name} Offer.")
-        benefits = st.text_area(
-            f"{ticket_name} Offer Benefits",
-            placeholder="Example: - Achieve inner peace and balance\n- Reduce stress and anxiety\n- Cultivate mindfulness and presence",
-            key=f"benefits_{ticket_name}",
-        )
-
-        ticket_item = {
-            "product_name": product_name,
-            "product_type": product_type,
-            "price": price,
-            "features_desc": features_desc,
-            "benefits": benefits,
-        }
-        ticket_items.append(ticket_item)
-    # ... (rest of the code remains unchanged until the submit button logic)
-
-    # Submit Button
-    submit_button = st.button("Submit", key="submit_button")
-
-    if submit_button:
-        # Check if any default values are unchanged
-
-        default_values_unchanged = False
-        for key, value in st.session_state.items():
-            if isinstance(value, str) and value.startswith("Example:"):
-                default_values_unchanged = False  # temporary
-                break
 
-        if default_values_unchanged:
-            st.warning(
-                "Please update all fields with your own information before submitting."
-            )
-        else:
-            # Process the form data
-            form_data = {
-                "email": st.session_state.get(
-                    "email"
-                ),  # Assuming email is collected elsewhere in the form
-                "avatar_desc": avatar_desc,
-                "avatar_pain_list": avatar_pain_list,
-                "unique_value_prop": unique_value_prop,
-                "uvp_type": uvp_type,
-                "uvp_proof": uvp_proof,
-                "lead_magnet_desc": lead_magnet_desc,
-                "num_ticket_items": num_ticket_items,
-                "ticket_order": ticket_order,
-                "ticket_items": ticket_items,
-            }
-            # Insert or update form data in Supabase
-            insert_or_update_form_data(form_data["email"], form_data)
-            st.success("Form submitted successfully")
+def save_submission(payload):
+    email = st.session_state.get("email")
+    if not email:
+        st.warning("Please enter a valid email.")
+        return
+    # Same checks as the form, on what is actually about to be stored
+    errors = validate_payload(payload)
+    if errors:
+        st.error("The submission wasn't saved:")
+        for error in errors:
+            st.caption(error.message)
+        return
+    # Insert or update form data in Supabase
+    insert_or_update_form_data(email, {"email": email, **payload})
+    st.success("Form submitted successfully")
 
 
 if __name__ == "__main__":
-    main()
+    with timed_run("script"):
+        main()
@@ -1,43 +1,25 @@
 # streamdspy1.py
-import os
 import streamlit as st
-from supabase import create_client, Client
+from supabase import Client
+from clients import get_supabase, unify_lm
 import dspy
 from dotenv import load_dotenv
+from projections import fetch_projected_submission
+from singleflight import flight_stats
+from hedging import hedge_metrics
+from jobs import job_queue
+from job_view import job_section, timing_caption, worker_stats_section
+from result_store import StoredResult, result_key, session_results
+from funnel import generate_funnel
+from funnel_template import available_templates, load_template
 
 load_dotenv()
 # Configure the Unify model
-
-unify_key = os.getenv("UNIFY_API_KEY")
-print(unify_key)
-unify_model = dspy.OpenAI(
-    api_base="https://api.unify.ai/v0/",
-    api_key=unify_key,
-    model="mixtral-8x7b-instruct-v0.1@together-ai",
-    model_type="chat",
-)
+unify_model = unify_lm("mixtral-8x7b-instruct-v0.1@together-ai")
 dspy.settings.configure(lm=unify_model)
 
-
-class BusinessSummary(dspy.Signature):
-    """Generate a copywriting business breakdown based on the business background and details"""
-
-    form_data = dspy.InputField(
-        desc="Business Background and details coming from Supabase form data",
-        format=lambda x: str(x),
-    )
-    summary = dspy.OutputField(
-        desc="A copywriting breakdown of a business and its menu in a voice to target the brand"
-    )
-
-
-generate_summary = dspy.Predict(BusinessSummary)
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-# Create a Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Shared, pooled Supabase client
+supabase: Client = get_supabase()
 
 
 def main():
@@ -47,25 +29,38 @@ def main():
 
     st.title("Business Summary Generator")
 
+    # Summaries are generated by worker.py: its routing, hedging and
+    # coalesced calls
+    with st.sidebar.expander("Workers"):
+        worker_stats_section()
+
+    # The funnel sections and row fetches, which run in this process
+    with st.sidebar.expander("This page's requests"):
+        st.json({"hedging": hedge_metrics.snapshot(), "coalesced": flight_stats()})
+
+    # Generation jobs by status; python worker.py runs them
+    with st.sidebar.expander("Job queue"):
+        st.json(job_queue.stats())
+
+    # Results kept for this session, to see what the store holds
+    with st.sidebar.expander("Session results"):
+        st.json(session_results().stats())
+
     # User input for email address
     email = st.text_input("Enter your email address")
 
     if email:
-        # Query Supabase to get the row based on email
-        query = (
-            supabase.table("form_submissions").select("*").eq("email", email).limit(1)
-        )
-        result = query.execute()
+        # Get the row for this email, from the cache when possible
+        row_data = fetch_projected_submission(supabase, email, "business_summary")
 
-        if len(result.data) > 0:
+        if row_data is not None:
             # Display the row data in a clean format
-            row_data = result.data[0]
             st.subheader("Business Information")
             st.write(f"Avatar Description: {row_data['avatar_desc']}")
             st.write(f"Avatar Pain List: {row_data['avatar_pain_list']}")
             st.write(f"Unique Value Proposition: {row_data['unique_value_prop']}")
             st.write(f"UVP Type: {row_data['uvp_type']}")
-            st.write(f"Other UVP Description: {row_data['other_uvp_desc']}")
+            st.write(f"UVP Proof: {row_data['uvp_proof']}")
             st.write(f"Lead Magnet Description: {row_data['lead_magnet_desc']}")
             st.write(f"Number of Ticket Items: {row_data['num_ticket_items']}")
 
@@ -79,31 +74,84 @@ def main():
                 st.write(f"  Features/Description: {ticket_item['features_desc']}")
                 st.write(f"  Benefits: {ticket_item['benefits']}")
 
-            # Button to generate business summary
-            if st.button("Generate Funnel Output"):
-                # Generate the business summary using DSPy
-                pred = generate_summary(form_data=row_data)
-                business_summary = pred.summary
+            force_regenerate = st.checkbox(
+                "Force regenerate",
+                help="Skip the saved result for these inputs and call the model again",
+            )
+            # Finished summaries stay in the session's result store, so
+            # Download and reruns read them back; the generation itself runs in
+            # a worker process and the page only polls its job
+            results = session_results()
+            key = result_key(email, "summary", row_data)
+            # Button to generate business summary; unless forced, a summary
+            # this session already has for this row is shown again
+            if st.button("Generate Funnel Output") and (
+                force_regenerate or results.get(key) is None
+            ):
+                job_id = job_queue.enqueue(
+                    "business_summary",
+                    {"email": email, "form_data": row_data, "force": force_regenerate},
+                )
+                results.start_job(key, job_id)
+
+            def show_job_result(job):
+                stored = results.finish_job(
+                    key,
+                    job.id,
+                    StoredResult(job.result["summary"], details=job.result, saved=True),
+                )
+                show_summary(stored)
 
-                # Display the business summary
+            if results.job_for(key) is not None:
+                st.subheader("Business Summary")
+                job_section(results.job_for(key), show_job_result)
+            elif results.get(key) is not None:
                 st.subheader("Business Summary")
-                # st.markdown(business_summary)
-                st.write(business_summary)
-                st.write("---")
+                show_summary(results.get(key))
+
+            # Button to generate the landing page funnel section by section
+            templates = available_templates()
+            template_name = st.selectbox("Funnel template", list(templates))
+            if st.button("Generate Funnel Sections"):
+                template = load_template(templates[template_name])
+                # One placeholder per section so results land in template
+                # order whichever call finishes first
+                placeholders = {}
+                for section in template.sections:
+                    placeholder = placeholders[section.heading] = st.empty()
+                    placeholder.info(f"Writing {section.heading}...")
+                copies = {}
+                for section, section_copy in generate_funnel(
+                    row_data, unify_model, force=force_regenerate, template=template
+                ):
+                    copies[section.heading] = section_copy
+                    with placeholders[section.heading].container():
+                        st.subheader(section.heading)
+                        st.write(section_copy)
+                        missing = section.missing_labels(section_copy)
+                        if missing:
+                            st.caption(f"Not filled in: {', '.join(missing)}")
+
                 st.download_button(
-                    "Download Complete Summary",
-                    data=business_summary,
-                    file_name="business_summary.txt",
+                    "Download Funnel Copy",
+                    data=template.assemble(copies),
+                    file_name="funnel_copy.txt",
                 )
-
-                # Save the business summary to Supabase
-                supabase.table("business_summaries").upsert(
-                    {"email": email, "summary": business_summary}
-                ).execute()
-                st.success("Business summary generated and saved to Supabase!")
         else:
             st.warning("No data found for the provided email address.")
 
 
+def show_summary(stored):
+    st.write(stored.text)
+    timing_caption(stored.details)
+    st.write("---")
+    st.download_button(
+        "Download Complete Summary",
+        data=stored.text,
+        file_name="business_summary.txt",
+    )
+    st.success("Business summary generated and saved to Supabase!")
+
+
 if __name__ == "__main__":
     main()
@@ -1,51 +1,22 @@
 # streamdspy1.py
-import os
+import json
+
 import streamlit as st
-from supabase import create_client, Client
-import dspy
+from supabase import Client
+from clients import get_supabase
 from dotenv import load_dotenv
+from projections import fetch_projected_submission
+from outputs import insert_analyses
+from jobs import job_queue
+from job_view import job_section, timing_caption, worker_stats_section
+from result_store import StoredResult, result_key, session_results
 
 load_dotenv()
-# Configure the Unify model
-unify_key = os.getenv("UNIFY_API_KEY")
-print(unify_key)
-mixtral = dspy.OpenAI(
-    api_base="https://api.unify.ai/v0/",
-    api_key=unify_key,
-    model="mixtral-8x7b-instruct-v0.1@together-ai",
-    model_type="chat",
-)
-gpt35 = dspy.OpenAI(
-    api_base="https://api.unify.ai/v0/",
-    api_key=unify_key,
-    model="gpt-3.5-turbo@openai",
-    # model="mixtral-8x7b-instruct-v0.1@together-ai",
-    model_type="chat",
-    max_tokens=2**12,
-)
-dspy.settings.configure(lm=gpt35)
-
-
-class BusinessAnalysis(dspy.Signature):
-    """Generate a business analysis based on the provided context"""
-
-    context = dspy.InputField(
-        desc="Business background and details, including additional user input",
-        format=lambda x: str(x),
-    )
-    topic = dspy.InputField(desc="The topic for the business analysis")
-    analysis = dspy.OutputField(
-        desc="A business analysis based on the provided context and topic"
-    )
-
-
-generate_analysis = dspy.Predict(BusinessAnalysis)
+# The analysis itself runs in worker.py, which routes each request to
+# whichever Unify model is currently fastest and healthy
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-# Create a Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Shared, pooled Supabase client
+supabase: Client = get_supabase()
 
 
 def main():
@@ -53,19 +24,28 @@ def main():
 
     st.title("Business Analysis Generator")
 
+    # Generation jobs by status; python worker.py runs them
+    with st.sidebar.expander("Job queue"):
+        st.json(job_queue.stats())
+
+    # Model routing decisions and per-model latency, hedging and coalesced
+    # calls, as reported by the workers
+    with st.sidebar.expander("Workers"):
+        worker_stats_section()
+
+    # Results kept for this session, to see what the store holds
+    with st.sidebar.expander("Session results"):
+        st.json(session_results().stats())
+
     # User input for email address
     email = st.text_input("Enter your email address")
 
     if email:
-        # Query Supabase to get the row based on email
-        query = (
-            supabase.table("form_submissions").select("*").eq("email", email).limit(1)
-        )
-        result = query.execute()
+        # Get the row for this email, from the cache when possible
+        row_data = fetch_projected_submission(supabase, email, "business_analysis")
 
-        if len(result.data) > 0:
+        if row_data is not None:
             # Display the row data in a clean format
-            row_data = result.data[0]
             st.subheader("Business Information")
             st.write(f"Avatar Description: {row_data['avatar_desc']}")
             st.write(f"Avatar Pain List: {row_data['avatar_pain_list']}")
@@ -88,40 +68,146 @@ def main():
             # Additional user input
             additional_input = st.text_area("Provide additional context (optional)")
 
-            # Topic input
-            topic = st.text_input("Enter the topic for the business analysis")
-
-            # Button to generate business analysis
+            # Topic input; several topics, one per line, are analyzed at once
+            topics = topic_list(
+                st.text_area("Enter the topics for the business analysis, one per line")
+            )
+
+            force_regenerate = st.checkbox(
+                "Force regenerate",
+                help="Skip the saved result for these inputs and call the model again",
+            )
+            save_when_done = st.checkbox("Save the analysis to Supabase when done")
+            # Combine the row data and additional user input
+            context = {
+                "row_data": row_data,
+                "additional_input": additional_input,
+            }
+            # Finished analyses stay in the session's result store, so Save,
+            # Download and reruns read them back; the generation itself runs
+            # in a worker process and the page only polls its job
+            results = session_results()
+            keys = {topic: result_key(email, topic, context) for topic in topics}
+            # Button to generate business analysis; unless forced, analyses
+            # this session already has for these inputs are shown again
             if st.button("Generate Business Analysis"):
-                # Combine the row data and additional user input
-                context = {
-                    "row_data": row_data,
-                    "additional_input": additional_input,
-                }
-
-                # Generate the business analysis using DSPy
-                pred = generate_analysis(context=context, topic=topic)
-                business_analysis = pred.analysis
-
-                # Display the business analysis
+                missing = [
+                    topic
+                    for topic in topics
+                    if force_regenerate or results.get(keys[topic]) is None
+                ]
+                if missing:
+                    job_id = enqueue_analysis(
+                        email, context, missing, force_regenerate, save_when_done
+                    )
+                    for topic in missing:
+                        results.start_job(keys[topic], job_id)
+
+            # Decided before anything is drawn: drawing a finished job moves
+            # its topics into the store
+            pending = {topic: results.job_for(keys[topic]) for topic in topics}
+            if any(pending.values()) or any(results.get(keys[t]) for t in topics):
                 st.subheader("Business Analysis")
-                st.write(business_analysis)
-
-                # Button to save the analysis to Supabase
-                if st.button("Save Analysis to Supabase"):
-                    # Save the analysis to the llm_outputs table
-                    supabase.table("llm_outputs").insert(
-                        {
-                            "email": email,
-                            "context": str(context),
-                            "topic": topic,
-                            "analysis": business_analysis,
-                        }
-                    ).execute()
-                    st.success("Business analysis saved to Supabase!")
+
+            def show_job_result(job):
+                for topic, result in job_results(job).items():
+                    stored = results.finish_job(
+                        result_key(email, topic, job.payload["context"]),
+                        job.id,
+                        StoredResult(
+                            result["analysis"],
+                            details=result,
+                            saved=job.result["saved"],
+                        ),
+                    )
+                    show_analysis(stored, email, topic, context)
+                for topic, error in job.result.get("errors", {}).items():
+                    st.error(f"{topic}: {error}")
+
+            shown_jobs = set()
+            unsaved = {}
+            for topic in topics:
+                job_id = pending[topic]
+                if job_id is not None:
+                    if job_id not in shown_jobs:
+                        shown_jobs.add(job_id)
+                        job_section(job_id, show_job_result, show_job_progress)
+                elif results.get(keys[topic]) is not None:
+                    stored = results.get(keys[topic])
+                    show_analysis(stored, email, topic, context)
+                    if not stored.saved:
+                        unsaved[topic] = stored
+
+            # One insert for every analysis on the page not saved yet
+            if len(unsaved) > 1 and st.button("Save all analyses to Supabase"):
+                save_analyses(email, context, unsaved)
+                st.success(f"{len(unsaved)} analyses saved to Supabase!")
         else:
             st.warning("No data found for the provided email address.")
 
 
+def topic_list(text):
+    # Non-empty lines, first occurrence of each
+    return list(
+        dict.fromkeys(line.strip() for line in text.splitlines() if line.strip())
+    )
+
+
+def enqueue_analysis(email, context, topics, force, save):
+    # A single topic streams its text as it is generated; several run as one
+    # batch job that generates them concurrently
+    payload = {"email": email, "context": context, "force": force, "save": save}
+    if len(topics) == 1:
+        return job_queue.enqueue("business_analysis", {**payload, "topic": topics[0]})
+    return job_queue.enqueue("business_analysis_batch", {**payload, "topics": topics})
+
+
+def job_results(job):
+    # {topic: result} for either kind of analysis job
+    if job.kind == "business_analysis":
+        return {job.payload["topic"]: job.result}
+    return job.result["analyses"]
+
+
+def show_job_progress(job):
+    # A single-topic job publishes the text so far, a batch job the JSON of
+    # the topics it has finished
+    if job.kind == "business_analysis":
+        st.write(job.partial)
+        return
+    progress = json.loads(job.partial)
+    st.caption(f"{len(progress['analyses'])} of {progress['total']} topics done")
+    for topic, result in progress["analyses"].items():
+        st.markdown(f"#### {topic}")
+        st.write(result["analysis"])
+
+
+def show_analysis(stored, email, topic, context):
+    st.markdown(f"#### {topic}")
+    st.write(stored.text)
+    timing_caption(stored.details)
+    st.download_button(
+        "Download Analysis",
+        data=stored.text,
+        file_name="business_analysis.txt",
+        key=f"download:{topic}",
+    )
+    if stored.saved:
+        st.success("Business analysis saved to Supabase!")
+    # Button to save the analysis to Supabase
+    elif st.button("Save Analysis to Supabase", key=f"save:{topic}"):
+        save_analyses(email, context, {topic: stored})
+        st.success("Business analysis saved to Supabase!")
+
+
+def save_analyses(email, context, stored):
+    # Save the analyses to the llm_outputs table
+    insert_analyses(
+        supabase, email, context, {topic: s.text for topic, s in stored.items()}
+    )
+    for result in stored.values():
+        result.saved = True
+
+
 if __name__ == "__main__":
     main()
@@ -1,83 +1,43 @@
 # streamdspy1.py
-import os
 import streamlit as st
-import asyncio
-from supabase import create_client, Client
+from clients import unify_lm
 import dspy
 from dotenv import load_dotenv
+from async_pipeline import aload_business, apredict, asave_summary, get_loop
+from signatures import BusinessSummary
+from streaming import StreamingPredict
 
 load_dotenv()
 # Configure the Unify model
-
-unify_key = os.getenv("UNIFY_API_KEY")
-print(unify_key)
-unify_model = dspy.OpenAI(
-    api_base="https://api.unify.ai/v0/",
-    api_key=unify_key,
-    model="mixtral-8x7b-instruct-v0.1@together-ai",
-    model_type="chat",
-)
+unify_model = unify_lm("mixtral-8x7b-instruct-v0.1@together-ai")
 dspy.settings.configure(lm=unify_model)
 
-
-class BusinessSummary(dspy.Signature):
-    """Generate a copywriting business breakdown based on the business background and details"""
-
-    form_data = dspy.InputField(
-        desc="Business Background and details coming from Supabase form data",
-        format=lambda x: str(x),
-    )
-    summary = dspy.OutputField(
-        desc="A copywriting breakdown of a business and its menu in a voice to target the brand"
-    )
-
-
-generate_summary = dspy.Predict(BusinessSummary)
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-# Create a Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-
-async def generate_business_summary(row_data):
-    pred = await generate_summary(form_data=row_data)
-    return pred.summary
-
-
-async def save_summary_to_supabase(email, business_summary):
-    await supabase.table("business_summaries").insert(
-        {"email": email, "summary": business_summary}
-    ).execute()
+# The prediction runs on the background loop's thread, so pass the lm explicitly
+generate_summary = StreamingPredict(BusinessSummary, lm=unify_model)
 
 
 def main():
     st.set_page_config(page_title="Business Summary Generator", layout="wide")
 
-    # Initialize Supabase client
-
     st.title("Business Summary Generator")
 
     # User input for email address
     email = st.text_input("Enter your email address")
 
     if email:
-        # Query Supabase to get the row based on email
-        query = (
-            supabase.table("form_submissions").select("*").eq("email", email).limit(1)
+        # Fetch the row and any previously saved summary concurrently
+        row_data, saved_summary = get_loop().run(
+            aload_business(email, "business_summary")
         )
-        result = query.execute()
 
-        if len(result.data) > 0:
+        if row_data is not None:
             # Display the row data in a clean format
-            row_data = result.data[0]
             st.subheader("Business Information")
             st.write(f"Avatar Description: {row_data['avatar_desc']}")
             st.write(f"Avatar Pain List: {row_data['avatar_pain_list']}")
             st.write(f"Unique Value Proposition: {row_data['unique_value_prop']}")
             st.write(f"UVP Type: {row_data['uvp_type']}")
-            st.write(f"Other UVP Description: {row_data['other_uvp_desc']}")
+            st.write(f"UVP Proof: {row_data['uvp_proof']}")
             st.write(f"Lead Magnet Description: {row_data['lead_magnet_desc']}")
             st.write(f"Number of Ticket Items: {row_data['num_ticket_items']}")
 
@@ -91,20 +51,28 @@ def main():
                 st.write(f"  Features/Description: {ticket_item['features_desc']}")
                 st.write(f"  Benefits: {ticket_item['benefits']}")
 
-            # Button to generate business summary
+            if saved_summary:
+                with st.expander("Previously saved summary"):
+                    st.write(saved_summary)
 
+            # Button to generate business summary
             if st.button("Generate Funnel Output"):
-                # Generate the business summary using DSPy
-                business_summary = asyncio.run(generate_business_summary(row_data))
-
-                # Display the business summary
+                # Generate on the background loop, then start the Supabase
+                # write there without waiting for it
+                pred = get_loop().run(
+                    apredict(
+                        generate_summary, tags={"email": email}, form_data=row_data
+                    )
+                )
+                business_summary = pred.summary
+                save = get_loop().submit(asave_summary(email, business_summary))
+
+                # Display the business summary while it is being saved
                 st.subheader("Business Summary")
                 st.write(business_summary)
 
-                # Button to save the business summary to Supabase
-                if st.button("Save Business Summary"):
-                    asyncio.run(save_summary_to_supabase(email, business_summary))
-                    st.success("Business summary saved to Supabase!")
+                save.result()
+                st.success("Business summary saved to Supabase!")
         else:
             st.warning("No data found for the provided email address.")
 
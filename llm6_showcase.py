@@ -1,51 +1,33 @@
 # streamdspy1.py
-import os
 import streamlit as st
-from supabase import create_client, Client
+from supabase import Client
+from clients import get_supabase
 import dspy
 from dotenv import load_dotenv
+from projections import fetch_projected_submission
+from outputs import insert_analyses
+from model_router import unify_router
+from singleflight import flight_stats
+from hedging import DeadlineExceeded, hedge_metrics
+from signatures import BusinessAnalysis
+from streaming import StreamingPredict
+from job_view import timing_caption
+from result_store import StoredResult, result_key, session_results
 
 load_dotenv()
-# Configure the Unify model
-unify_key = os.getenv("UNIFY_API_KEY")
-print(unify_key)
-mixtral = dspy.OpenAI(
-    api_base="https://api.unify.ai/v0/",
-    api_key=unify_key,
-    model="mixtral-8x7b-instruct-v0.1@together-ai",
-    model_type="chat",
-)
-gpt35 = dspy.OpenAI(
-    api_base="https://api.unify.ai/v0/",
-    api_key=unify_key,
-    model="gpt-3.5-turbo@openai",
-    # model="mixtral-8x7b-instruct-v0.1@together-ai",
-    model_type="chat",
+# Configure the Unify models; each request goes to whichever is currently
+# fastest and healthy, failing over to the other
+router = unify_router(
+    "gpt-3.5-turbo@openai",
+    "mixtral-8x7b-instruct-v0.1@together-ai",
     max_tokens=2**12,
 )
-dspy.settings.configure(lm=gpt35)
-
-
-class BusinessAnalysis(dspy.Signature):
-    """Generate a business analysis based on the provided context"""
-
-    context = dspy.InputField(
-        desc="Business background and details, including additional user input",
-        format=lambda x: str(x),
-    )
-    topic = dspy.InputField(desc="The topic for the business analysis")
-    analysis = dspy.OutputField(
-        desc="A business analysis based on the provided context and topic"
-    )
+dspy.settings.configure(lm=router)
 
+generate_analysis = StreamingPredict(BusinessAnalysis, lm=router)
 
-generate_analysis = dspy.Predict(BusinessAnalysis)
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-# Create a Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Shared, pooled Supabase client
+supabase: Client = get_supabase()
 
 
 def main():
@@ -53,19 +35,28 @@ def main():
 
     st.title("Business Analysis Generator")
 
+    # Per-model latency/error stats and recent routing decisions
+    with st.sidebar.expander("Model routing"):
+        st.json(router.snapshot())
+        st.json(hedge_metrics.snapshot())
+
+    # Identical predictions and row fetches that shared one in-flight call
+    with st.sidebar.expander("Coalesced calls"):
+        st.json(flight_stats())
+
+    # Results kept for this session, to see what the store holds
+    with st.sidebar.expander("Session results"):
+        st.json(session_results().stats())
+
     # User input for email address
     email = st.text_input("Enter your email address")
 
     if email:
-        # Query Supabase to get the row based on email
-        query = (
-            supabase.table("form_submissions").select("*").eq("email", email).limit(1)
-        )
-        result = query.execute()
+        # Get the row for this email, from the cache when possible
+        row_data = fetch_projected_submission(supabase, email, "business_analysis")
 
-        if len(result.data) > 0:
+        if row_data is not None:
             # Display the row data in a clean format
-            row_data = result.data[0]
             st.subheader("Business Information")
             st.write(f"Avatar Description: {row_data['avatar_desc']}")
             st.write(f"Avatar Pain List: {row_data['avatar_pain_list']}")
@@ -91,33 +82,67 @@ def main():
             # Topic input
             topic = st.text_input("Enter the topic for the business analysis")
 
-            # Button to generate business analysis
-            if st.button("Generate Business Analysis"):
-                # Combine the row data and additional user input
-                context = {
-                    "row_data": row_data,
-                    "additional_input": additional_input,
-                }
-
-                # Generate the business analysis using DSPy
-                pred = generate_analysis(context=context, topic=topic)
-                business_analysis = pred.analysis
-
-                # Display the business analysis
+            force_regenerate = st.checkbox(
+                "Force regenerate",
+                help="Skip the saved result for these inputs and call the model again",
+            )
+            # Combine the row data and additional user input
+            context = {
+                "row_data": row_data,
+                "additional_input": additional_input,
+            }
+            # Generated analyses stay in the session's result store, so Save,
+            # Download and reruns read them back instead of generating again
+            results = session_results()
+            key = result_key(email, topic, context)
+            stored = results.get(key)
+            # Button to generate business analysis; unless forced, an analysis
+            # this session already has for these inputs is shown again
+            if st.button("Generate Business Analysis") and (
+                force_regenerate or stored is None
+            ):
+                # Stream the business analysis into the page as it is generated
                 st.subheader("Business Analysis")
-                st.write(business_analysis)
-
+                generation = generate_analysis.stream(
+                    force=force_regenerate,
+                    tags={"email": email},
+                    context=context,
+                    topic=topic,
+                )
+                try:
+                    st.write_stream(iter(generation))
+                except DeadlineExceeded:
+                    st.error("The model didn't respond in time, please try again.")
+                    st.stop()
+                stored = results.put(
+                    key,
+                    StoredResult(
+                        generation.prediction.analysis,
+                        details={
+                            "cache_hit": generation.timing.cache_hit,
+                            "first_token_s": generation.timing.first_token_s,
+                            "total_s": generation.timing.total_s,
+                        },
+                    ),
+                )
+            elif stored is not None:
+                st.subheader("Business Analysis")
+                st.write(stored.text)
+
+            if stored is not None:
+                timing_caption(stored.details)
+                st.download_button(
+                    "Download Analysis",
+                    data=stored.text,
+                    file_name="business_analysis.txt",
+                )
+                if stored.saved:
+                    st.success("Business analysis saved to Supabase!")
                 # Button to save the analysis to Supabase
-                if st.button("Save Analysis to Supabase"):
+                elif st.button("Save Analysis to Supabase"):
                     # Save the analysis to the llm_outputs table
-                    supabase.table("llm_outputs").insert(
-                        {
-                            "email": email,
-                            "context": str(context),
-                            "topic": topic,
-                            "analysis": business_analysis,
-                        }
-                    ).execute()
+                    insert_analyses(supabase, email, context, {topic: stored.text})
+                    stored.saved = True
                     st.success("Business analysis saved to Supabase!")
         else:
             st.warning("No data found for the provided email address.")
@@ -0,0 +1,12 @@
+-- Unique index on form_submissions.email.
+-- Backs both the lookup by email and the on_conflict target used by
+-- insert_or_update_form_data, so a submit is a single atomic upsert.
+
+-- Keep only the most recent submission per email before adding the constraint
+delete from form_submissions a
+using form_submissions b
+where a.email = b.email
+  and a.id < b.id;
+
+create unique index if not exists form_submissions_email_key
+    on form_submissions (email);
@@ -0,0 +1,34 @@
+-- updated_at on form_submissions and business_summaries, and a unique index on
+-- business_summaries.email. pregenerate.py skips a submission whose summary
+-- is newer than it, and upserts summaries on email, one row per business.
+
+alter table form_submissions
+    add column if not exists updated_at timestamptz not null default now();
+alter table business_summaries
+    add column if not exists updated_at timestamptz not null default now();
+
+create or replace function set_updated_at() returns trigger as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists form_submissions_updated_at on form_submissions;
+create trigger form_submissions_updated_at
+    before update on form_submissions
+    for each row execute function set_updated_at();
+
+drop trigger if exists business_summaries_updated_at on business_summaries;
+create trigger business_summaries_updated_at
+    before update on business_summaries
+    for each row execute function set_updated_at();
+
+-- Keep only the most recent summary per email before adding the constraint
+delete from business_summaries a
+using business_summaries b
+where a.email = b.email
+  and a.id < b.id;
+
+create unique index if not exists business_summaries_email_key
+    on business_summaries (email);
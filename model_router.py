@@ -0,0 +1,183 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import openai
+import streamlit as st
+from dsp.modules.lm import LM
+
+from clients import trim_history, unify_lm
+
+logger = logging.getLogger(__name__)
+
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", "50"))
+ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))
+ROUTER_MAX_CONSECUTIVE_FAILURES = int(os.getenv("ROUTER_MAX_CONSECUTIVE_FAILURES", "3"))
+ROUTER_COOLDOWN_S = float(os.getenv("ROUTER_COOLDOWN_S", "30"))
+
+
+def is_failover_error(error):
+    # Timeouts, dropped connections and 5xx responses move on to the next
+    # backend; anything else (bad request, auth) is the caller's problem
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class AllBackendsFailed(RuntimeError):
+    pass
+
+
+class BackendStats:
+    def __init__(self, model, window=ROUTER_WINDOW):
+        self.model = model
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.requests = 0
+
+    @property
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def healthy(self, now):
+        return now >= self.unhealthy_until
+
+    def record(self, latency, ok, now):
+        self.requests += 1
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            return
+        self.consecutive_failures += 1
+        if (
+            self.consecutive_failures >= ROUTER_MAX_CONSECUTIVE_FAILURES
+            or self.error_rate > ROUTER_MAX_ERROR_RATE
+        ):
+            # Take the backend out of rotation for a while, then probe again
+            self.unhealthy_until = now + ROUTER_COOLDOWN_S
+
+    def snapshot(self, now):
+        return {
+            "model": self.model,
+            "requests": self.requests,
+            "p50_s": percentile(self.latencies, 0.5),
+            "p95_s": percentile(self.latencies, 0.95),
+            "error_rate": self.error_rate,
+            "healthy": self.healthy(now),
+        }
+
+
+class RouterLM(LM):
+    """Sends each request to the fastest healthy backend, failing over on timeouts and 5xx errors"""
+
+    def __init__(self, backends):
+        super().__init__(model=backends[0].kwargs["model"])
+        self.provider = "openai"
+        self.backends = list(backends)
+        # Generation params are taken from the primary backend
+        self.kwargs = dict(backends[0].kwargs)
+        self.stats = {
+            id(backend): BackendStats(backend.kwargs["model"]) for backend in backends
+        }
+        self.decisions = deque(maxlen=200)
+        self._lock = threading.Lock()
+
+    def _rank_key(self, backend, now):
+        stats = self.stats[id(backend)]
+        p50 = percentile(stats.latencies, 0.5)
+        # Healthy before cooling down, untried before measured, then fastest
+        return (not stats.healthy(now), p50 is not None, p50 or 0.0)
+
+    def ranked_backends(self):
+        now = time.monotonic()
+        with self._lock:
+            return sorted(self.backends, key=lambda b: self._rank_key(b, now))
+
+    def record(self, backend, latency, ok):
+        with self._lock:
+            self.stats[id(backend)].record(latency, ok, time.monotonic())
+
+    def log_decision(self, decision):
+        with self._lock:
+            self.decisions.append(decision)
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "backends": [self.stats[id(b)].snapshot(now) for b in self.backends],
+                "recent_decisions": list(self.decisions)[-20:],
+            }
+
+    def call_with_failover(self, request):
+        # request(backend) performs one attempt against a backend; the first
+        # attempt that doesn't fail with a failover error wins
+        ranked = self.ranked_backends()
+        decision = {
+            "at": time.time(),
+            "ranking": [backend.kwargs["model"] for backend in ranked],
+            "attempts": [],
+        }
+        try:
+            for backend in ranked:
+                started = time.perf_counter()
+                try:
+                    result = request(backend)
+                except Exception as error:
+                    if not is_failover_error(error):
+                        raise
+                    latency = time.perf_counter() - started
+                    self.record(backend, latency, False)
+                    decision["attempts"].append(
+                        {"model": backend.kwargs["model"], "error": repr(error)}
+                    )
+                    logger.warning(
+                        "%s failed, failing over: %s", backend.kwargs["model"], error
+                    )
+                    continue
+                latency = time.perf_counter() - started
+                self.record(backend, latency, True)
+                decision["attempts"].append(
+                    {"model": backend.kwargs["model"], "latency_s": latency}
+                )
+                return backend, result
+        finally:
+            self.log_decision(decision)
+        raise AllBackendsFailed(f"every backend failed: {decision['attempts']}")
+
+    def basic_request(self, prompt, **kwargs):
+        backend, response = self.call_with_failover(
+            lambda backend: backend.basic_request(prompt, **kwargs)
+        )
+        self.history.append({**backend.history[-1], "model": backend.kwargs["model"]})
+        trim_history(self)
+        return response
+
+    def __call__(self, prompt, only_completed=True, return_sorted=False, **kwargs):
+        response = self.basic_request(prompt, **kwargs)
+        choices = response["choices"]
+        if only_completed:
+            completed = [c for c in choices if c["finish_reason"] != "length"]
+            choices = completed or choices
+        return [choice["message"]["content"] for choice in choices]
+
+
+@st.cache_resource
+def unify_router(*models, **kwargs):
+    # One router per model set and process, so latency stats accumulate
+    # across sessions
+    return RouterLM([unify_lm(model, **kwargs) for model in models])
@@ -0,0 +1,33 @@
+from context_serializer import serialize_context
+from recorder import recorded
+
+# Writes of generated text to Supabase, shared by the pages and worker.py
+
+
+def save_summary(supabase, email, summary):
+    save_summaries(supabase, [{"email": email, "summary": summary}])
+
+
+def save_summaries(supabase, summary_rows):
+    # One request for the whole batch; a business keeps a single summary row.
+    # Relies on the unique index from migrations/002_business_summaries_freshness.sql
+    with recorded(
+        "db.upsert", table="business_summaries", on_conflict="email", row=summary_rows
+    ):
+        (
+            supabase.table("business_summaries")
+            .upsert(summary_rows, on_conflict="email")
+            .execute()
+        )
+
+
+def insert_analyses(supabase, email, context, analyses):
+    # One llm_outputs row per topic, all in a single request. Every row shares
+    # the context, so it is serialized once.
+    serialized = serialize_context(context)
+    output_rows = [
+        {"email": email, "context": serialized, "topic": topic, "analysis": analysis}
+        for topic, analysis in analyses.items()
+    ]
+    with recorded("db.insert", table="llm_outputs", row=output_rows):
+        supabase.table("llm_outputs").insert(output_rows).execute()
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Disk-backed cache of LLM completions, shared by every app and process on the
+# machine. Entries expire after a TTL and the least recently used ones are
+# evicted once the stored completions exceed a size budget.
+PREDICTION_CACHE_PATH = os.getenv("PREDICTION_CACHE_PATH", "prediction_cache.sqlite3")
+PREDICTION_CACHE_MAX_BYTES = int(
+    os.getenv("PREDICTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def cache_key(signature, model, params, inputs):
+    # Canonical hash of everything that determines the completion
+    payload = json.dumps(
+        {
+            "signature": signature,
+            "model": model,
+            "params": params,
+            "inputs": inputs,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PredictionCache:
+    def __init__(
+        self,
+        path=PREDICTION_CACHE_PATH,
+        max_bytes=PREDICTION_CACHE_MAX_BYTES,
+        ttl=PREDICTION_CACHE_TTL,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute(
+            """
+            create table if not exists predictions (
+                key text primary key,
+                completion text not null,
+                size integer not null,
+                created_at real not null,
+                accessed_at real not null
+            )
+            """
+        )
+        self._conn.execute(
+            "create index if not exists predictions_accessed_at "
+            "on predictions (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "select completion, created_at from predictions where key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("delete from predictions where key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "update predictions set accessed_at = ? where key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, completion):
+        now = time.time()
+        size = len(completion.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "insert or replace into predictions values (?, ?, ?, ?, ?)",
+                (key, completion, size, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute(
+            "delete from predictions where created_at < ?", (now - self.ttl,)
+        )
+        (total,) = self._conn.execute(
+            "select coalesce(sum(size), 0) from predictions"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until back under budget
+        for key, size in self._conn.execute(
+            "select key, size from predictions order by accessed_at"
+        ).fetchall():
+            self._conn.execute("delete from predictions where key = ?", (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute(
+                "select count(*), coalesce(sum(size), 0) from predictions"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+        }
+
+
+prediction_cache = PredictionCache()
@@ -0,0 +1,293 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from clients import get_supabase
+from hedging import DeadlineExceeded
+from outputs import save_summaries
+from projections import SUBMISSION_COLUMNS
+from worker import summary_predictor
+
+logger = logging.getLogger(__name__)
+
+# Generates the business summary of every submission ahead of time, so opening
+# llm4 for any email is a cache read. Pages through form_submissions by id,
+# skips rows whose summary is newer than the submission, generates the rest
+# with bounded concurrency under a request rate limit, and upserts the results
+# in batches. The last finished page is checkpointed, so a crashed run resumes
+# where it stopped. A completed pass removes the checkpoint, so the next run
+# (e.g. nightly) starts over and skips whatever is still fresh.
+#
+#   python pregenerate.py --concurrency 4 --rate 2
+#   python pregenerate.py --restart --force
+PREGENERATE_CHECKPOINT_PATH = os.getenv(
+    "PREGENERATE_CHECKPOINT_PATH", "pregenerate_checkpoint.json"
+)
+# Freshness columns; see migrations/002_business_summaries_freshness.sql
+KEY_COLUMNS = ("id", "email", "created_at", "updated_at")
+
+
+class RateLimiter:
+    # At most `rate` acquisitions per second across threads, with bursts of up
+    # to `burst`
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {"last_id": 0, "counts": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    # Written to a temporary file and renamed, so a crash never leaves it torn
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def submission_pages(supabase, after_id, page_size):
+    # Keyset pagination: each page starts after the last id of the previous
+    # one, so a page costs the same however deep into the table it is
+    columns = ",".join(
+        dict.fromkeys(KEY_COLUMNS + SUBMISSION_COLUMNS["business_summary"])
+    )
+    while True:
+        rows = (
+            supabase.table("form_submissions")
+            .select(columns)
+            .gt("id", after_id)
+            .order("id")
+            .limit(page_size)
+            .execute()
+        ).data
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1]["id"]
+
+
+def summary_times(supabase, emails):
+    # email -> when its summary was last written, for one page in one request
+    result = (
+        supabase.table("business_summaries")
+        .select("email,updated_at,created_at")
+        .in_("email", emails)
+        .execute()
+    )
+    return {
+        row["email"]: _timestamp(row.get("updated_at") or row.get("created_at"))
+        for row in result.data
+    }
+
+
+def stale_rows(supabase, rows, force=False):
+    if force:
+        return rows
+    summarized = summary_times(supabase, [row["email"] for row in rows])
+    stale = []
+    for row in rows:
+        summarized_at = summarized.get(row["email"])
+        submitted_at = _timestamp(row.get("updated_at") or row.get("created_at"))
+        if (
+            summarized_at is None
+            or submitted_at is None
+            or summarized_at < submitted_at
+        ):
+            stale.append(row)
+    return stale
+
+
+def generate_summary(row, limiter, force=False):
+    limiter.acquire()
+    form_data = {
+        column: row.get(column) for column in SUBMISSION_COLUMNS["business_summary"]
+    }
+    generation = summary_predictor().stream(
+        force=force, tags={"email": row["email"]}, form_data=form_data
+    )
+    for _ in generation:
+        pass
+    return generation
+
+
+class Progress:
+    def __init__(self, total, counts):
+        self.total = total
+        self.counts = {
+            "scanned": 0,
+            "generated": 0,
+            "skipped": 0,
+            "failed": 0,
+            "cache_hits": 0,
+        }
+        self.counts.update(counts)
+        self.started = time.monotonic()
+        self.resumed_from = self.counts["scanned"]
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            self.counts[key] += value
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        scanned_now = self.counts["scanned"] - self.resumed_from
+        rate = scanned_now / elapsed if elapsed else 0.0
+        remaining = max(0, (self.total or 0) - self.counts["scanned"])
+        eta = f"{remaining / rate:.0f}s" if rate and self.total else "?"
+        return (
+            f"{self.counts['scanned']}/{self.total or '?'} scanned, "
+            f"{self.counts['generated']} generated "
+            f"({self.counts['cache_hits']} from cache), "
+            f"{self.counts['skipped']} fresh, {self.counts['failed']} failed; "
+            f"{rate:.2f} rows/s, "
+            f"{self.counts['generated'] / elapsed if elapsed else 0.0:.2f} summaries/s, "
+            f"ETA {eta}"
+        )
+
+
+def run(args):
+    supabase = get_supabase()
+    checkpoint = (
+        {"last_id": 0, "counts": {}}
+        if args.restart
+        else load_checkpoint(args.checkpoint)
+    )
+    total = (
+        supabase.table("form_submissions")
+        .select("id", count="exact")
+        .limit(1)
+        .execute()
+    ).count
+    progress = Progress(total, checkpoint["counts"])
+    limiter = RateLimiter(args.rate, burst=args.concurrency)
+    if checkpoint["last_id"]:
+        logger.info("resuming after submission id %s", checkpoint["last_id"])
+
+    finished = True
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for rows in submission_pages(supabase, checkpoint["last_id"], args.page_size):
+            stale = stale_rows(supabase, rows, force=args.force)
+            futures = {
+                executor.submit(generate_summary, row, limiter, args.force): row
+                for row in stale
+            }
+            summary_rows = []
+            failed = 0
+            cache_hits = 0
+            for future in as_completed(futures):
+                row = futures[future]
+                try:
+                    generation = future.result()
+                except DeadlineExceeded:
+                    logger.warning("summary for %s timed out", row["email"])
+                    failed += 1
+                    continue
+                except Exception:
+                    logger.exception("summary for %s failed", row["email"])
+                    failed += 1
+                    continue
+                cache_hits += generation.timing.cache_hit
+                summary_rows.append(
+                    {"email": row["email"], "summary": generation.prediction.summary}
+                )
+                if len(summary_rows) >= args.batch_size:
+                    save_summaries(supabase, summary_rows)
+                    summary_rows = []
+            if summary_rows:
+                save_summaries(supabase, summary_rows)
+
+            # The page is fully written; a restart begins after it. Failed rows
+            # stay stale, so the next run from the start picks them up.
+            progress.add(
+                scanned=len(rows),
+                generated=len(stale) - failed,
+                skipped=len(rows) - len(stale),
+                failed=failed,
+                cache_hits=cache_hits,
+            )
+            checkpoint = {"last_id": rows[-1]["id"], "counts": progress.counts}
+            save_checkpoint(args.checkpoint, checkpoint)
+            logger.info(progress.report())
+            if args.limit and progress.counts["scanned"] >= args.limit:
+                finished = False
+                break
+    if finished:
+        # A complete pass leaves nothing to resume; the next run starts over
+        # and skips whatever is still fresh
+        if os.path.exists(args.checkpoint):
+            os.remove(args.checkpoint)
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate business summaries")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="summaries generated at once"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=2.0,
+        help="LLM requests started per second at most (0 for no limit)",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=25, help="summaries per upsert request"
+    )
+    parser.add_argument("--checkpoint", default=PREGENERATE_CHECKPOINT_PATH)
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="ignore the checkpoint, scan from the start",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="regenerate fresh summaries too, bypassing the prediction cache",
+    )
+    parser.add_argument("--limit", type=int, help="stop after scanning about N rows")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    started = time.monotonic()
+    progress = run(args)
+    elapsed = time.monotonic() - started
+    print(progress.report())
+    print(f"finished in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+from questionnaire_schema import SCHEMA
+from submission_cache import afetch_submission, fetch_submission
+
+# Columns each view/generator reads from form_submissions. Query builders
+# select only these instead of select("*"), and rows are handed out as
+# ProjectedRow so reading a field that wasn't declared fails loudly. The
+# generators read everything the questionnaire schema writes.
+SUBMISSION_COLUMNS = {
+    # llm4.py: funnel/summary generator
+    "business_summary": SCHEMA.columns,
+    # llm5.py / llm6_showcase.py: business analysis generator
+    "business_analysis": SCHEMA.columns,
+    # llm3lit.py: "Get Data" preview of a previous submission
+    "questionnaire": ("email",) + SCHEMA.columns,
+}
+
+
+class UndeclaredColumnError(KeyError):
+    def __init__(self, consumer, column):
+        self.consumer = consumer
+        self.column = column
+        super().__init__(
+            f"{consumer!r} read form_submissions.{column} but did not declare it "
+            f"in projections.SUBMISSION_COLUMNS"
+        )
+
+    def __str__(self):
+        return self.args[0]
+
+
+class ProjectedRow(dict):
+    def __init__(self, consumer, row):
+        super().__init__(row)
+        self.consumer = consumer
+        self.columns = frozenset(SUBMISSION_COLUMNS[consumer])
+
+    def __getitem__(self, column):
+        if column not in self.columns:
+            raise UndeclaredColumnError(self.consumer, column)
+        return super().__getitem__(column)
+
+    def get(self, column, default=None):
+        if column not in self.columns:
+            raise UndeclaredColumnError(self.consumer, column)
+        return super().get(column, default)
+
+
+def select_columns(consumer):
+    # PostgREST select list for a consumer, e.g. "avatar_desc,uvp_type,..."
+    return ",".join(SUBMISSION_COLUMNS[consumer])
+
+
+def fetch_projected_submission(supabase, email, consumer):
+    row = fetch_submission(supabase, email, select_columns(consumer))
+    if row is None:
+        return None
+    return ProjectedRow(consumer, row)
+
+
+async def afetch_projected_submission(postgrest, email, consumer):
+    row = await afetch_submission(postgrest, email, select_columns(consumer))
+    if row is None:
+        return None
+    return ProjectedRow(consumer, row)
@@ -0,0 +1,89 @@
+import streamlit as st
+
+from questionnaire_schema import render_plan
+from rerun_stats import timed_run
+from validation import session_errors, track_form
+
+WIDGETS = {
+    "text_area": st.text_area,
+    "text_input": st.text_input,
+    "selectbox": st.selectbox,
+    "number_input": st.number_input,
+    "multiselect": st.multiselect,
+}
+DIVIDER = '<hr class="stDivider">'
+
+
+def render_widget(spec):
+    if spec.heading:
+        st.markdown(
+            f'<p class="stSubheader">{spec.heading}</p>', unsafe_allow_html=True
+        )
+    if spec.intro:
+        st.write(spec.intro)
+    return WIDGETS[spec.widget](spec.label, **spec.kwargs)
+
+
+def render_widgets(specs):
+    return {spec.column: render_widget(spec) for spec in specs}
+
+
+def render_section(section):
+    st.markdown(f'<p class="stHeader">{section.title}</p>', unsafe_allow_html=True)
+    st.markdown(
+        f'<p class="stSectionDesc">{section.description}</p>', unsafe_allow_html=True
+    )
+    values = render_widgets(section.widgets)
+    st.markdown(DIVIDER, unsafe_allow_html=True)
+    return values
+
+
+def render_structure(plan):
+    # Lives outside the form: changing it has to redraw the ticket fields
+    count = render_widget(plan.count_widget)
+    order = render_widget(plan.order_widgets[int(count)])
+    return count, order
+
+
+def render_tickets(plan, order):
+    items = []
+    for name in order:
+        st.markdown(
+            f'<p class="stSubheader">{plan.ticket_headings[name]}</p>',
+            unsafe_allow_html=True,
+        )
+        items.append(render_widgets(plan.ticket_widgets[name]))
+    return items
+
+
+@st.fragment
+def questionnaire_section(on_submit):
+    # Changing the offer structure reruns only this fragment. Everything else
+    # is in one form, so typing doesn't rerun anything until Submit, which
+    # reports the fields still failing validation or hands the payload to
+    # on_submit.
+    plan = render_plan()
+    with timed_run("questionnaire_section"):
+        count, order = render_structure(plan)
+        st.markdown(DIVIDER, unsafe_allow_html=True)
+
+        with st.form("questionnaire"):
+            values = {}
+            for section in plan.sections:
+                values.update(render_section(section))
+            items = render_tickets(plan, order)
+
+            # Submit Button
+            submit_button = st.form_submit_button("Submit", on_click=track_form)
+
+        if submit_button:
+            # Checked as the fields changed; this only reads the result
+            errors = session_errors(order)
+            if errors:
+                st.warning(
+                    "Please update all fields with your own information before submitting."
+                )
+                for error in errors:
+                    st.caption(error.message)
+            else:
+                on_submit(plan.build_payload(values, count, order, items))
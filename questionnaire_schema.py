@@ -0,0 +1,361 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+# The questionnaire every form app renders, declared once. Bump SCHEMA_VERSION
+# when fields are added, removed or renamed. compile_schema() turns it into a
+# RenderPlan with every label, option list and widget argument precomputed, so
+# a rerun only executes the plan. The same schema decides the Supabase payload,
+# its validation (validation.py) and the columns the generators select (see
+# projections.py).
+SCHEMA_VERSION = 2
+
+
+@dataclass(frozen=True)
+class Field:
+    key: str
+    widget: str
+    label: str
+    heading: str = None
+    intro: str = None
+    placeholder: str = None
+    help: str = None
+    options: tuple = ()
+    index: int = 0
+    min_value: int = None
+    max_value: int = None
+    value: int = None
+    step: int = None
+    max_chars: int = None
+    required: bool = False
+    # Collapsed labels still name the field in validation messages
+    label_visibility: str = "visible"
+
+
+@dataclass(frozen=True)
+class Section:
+    key: str
+    title: str
+    description: str
+    fields: tuple
+
+
+@dataclass(frozen=True)
+class RepeatGroup:
+    # One set of item_fields per name; labels may use {name} and {name_lower}
+    key: str
+    count_field: Field
+    order_field: Field
+    names: tuple
+    heading: str
+    item_fields: tuple
+
+    def names_for(self, count):
+        return self.names[: int(count)]
+
+
+@dataclass(frozen=True)
+class Schema:
+    version: int
+    sections: tuple
+    repeat_group: RepeatGroup
+
+    @property
+    def fields(self):
+        return tuple(field for section in self.sections for field in section.fields)
+
+    @property
+    def columns(self):
+        # form_submissions columns the questionnaire writes, besides email
+        group = self.repeat_group
+        return tuple(field.key for field in self.fields) + (
+            group.count_field.key,
+            group.order_field.key,
+            group.key,
+        )
+
+
+TEXT_MAX_CHARS = 2000
+
+PRODUCT_TYPES = (
+    "One time course/document",
+    "Recurring membership/community/club",
+    "One time Hourly Virtual",
+    "One time Hourly Local",
+    "Recurring/Package Hourly Virtual",
+    "Recurring/Package Hourly Local",
+    "One time Project Deliverable",
+    "Recurring Services (Retainer)",
+    "Virtual Experience/Event",
+    "In Person Experience/Event/Retreat",
+    "Other",
+)
+
+SCHEMA = Schema(
+    version=SCHEMA_VERSION,
+    sections=(
+        Section(
+            key="background",
+            title="Your Business Background",
+            description="Describe your business, target audience, and unique value proposition.",
+            fields=(
+                Field(
+                    key="avatar_desc",
+                    widget="text_area",
+                    label="Avatar Description",
+                    placeholder="Example: A busy working mom seeking inner peace and balance.",
+                    max_chars=TEXT_MAX_CHARS,
+                    required=True,
+                ),
+                Field(
+                    key="avatar_pain_list",
+                    widget="text_area",
+                    label="Avatar Problem/Pain List",
+                    placeholder="Example: Lack of time, difficulty balancing work and family, feeling overwhelmed.",
+                    max_chars=TEXT_MAX_CHARS,
+                    required=True,
+                ),
+                Field(
+                    key="uvp_type",
+                    widget="selectbox",
+                    label="Unique Value Proposition Type",
+                    label_visibility="collapsed",
+                    intro="Pick your unique value proposition.",
+                    options=(
+                        "Cheaper",
+                        "Bespoke",
+                        "White-Glove",
+                        "Luxury",
+                        "Niche",
+                        "Convenience",
+                        "Expertise",
+                        "Exclusivity",
+                        "Customization",
+                        "Other",
+                    ),
+                    index=2,
+                ),
+                Field(
+                    key="unique_value_prop",
+                    widget="text_area",
+                    label="Unique Value Proposition",
+                    placeholder="Example: Our holistic approach combines ancient wisdom with modern mindfulness techniques, tailored specifically for busy professionals seeking inner peace and balance.",
+                    max_chars=TEXT_MAX_CHARS,
+                    required=True,
+                ),
+                Field(
+                    key="uvp_proof",
+                    widget="text_area",
+                    label="What makes you uniquely qualified for this? Share some social proof, some numbers, to generate ethos and belief about your capability and success",
+                    max_chars=TEXT_MAX_CHARS,
+                ),
+            ),
+        ),
+        Section(
+            key="menu",
+            title="Your Menu",
+            description="Describe your offerings, including lead magnets, pricing, and packages.",
+            fields=(
+                Field(
+                    key="lead_magnet_desc",
+                    widget="text_area",
+                    label="Lead Magnet Description",
+                    placeholder="Example: Download our free guided meditation for inner peace.",
+                    max_chars=TEXT_MAX_CHARS,
+                    required=True,
+                ),
+            ),
+        ),
+    ),
+    repeat_group=RepeatGroup(
+        key="ticket_items",
+        count_field=Field(
+            key="num_ticket_items",
+            widget="number_input",
+            label="Number of Offerings",
+            label_visibility="collapsed",
+            heading="Number of Offerings",
+            intro="Select the number of offerings or packages you want to present.",
+            min_value=3,
+            max_value=5,
+            value=3,
+            step=1,
+        ),
+        order_field=Field(
+            key="ticket_order",
+            widget="multiselect",
+            label="Offer Order",
+            label_visibility="collapsed",
+            heading="Offer Order",
+            intro="Drag and drop the offerings to set the order in which they increase in price.",
+        ),
+        names=(
+            "Low Ticket",
+            "Medium Ticket",
+            "High Ticket",
+            "Additional Offer A",
+            "Additional Offer B",
+        ),
+        heading="{name} Offer",
+        item_fields=(
+            Field(
+                key="product_name",
+                widget="text_input",
+                label="{name} Offer Name",
+                intro="Enter the name of your {name_lower} offering or package.",
+                placeholder="Example: {name} Awakening Journey",
+                max_chars=200,
+                required=True,
+            ),
+            Field(
+                key="product_type",
+                widget="selectbox",
+                label="{name} Offer Type",
+                intro="Select the type of {name_lower} offering or package.",
+                options=PRODUCT_TYPES,
+            ),
+            Field(
+                key="price",
+                widget="number_input",
+                label="{name} Offer Price",
+                intro="Enter the price for {name} Offer. Use the plus button to increase the price by $50.",
+                min_value=0,
+                value=100,
+                step=50,
+            ),
+            Field(
+                key="features_desc",
+                widget="text_area",
+                label="{name} Offer Features/Description",
+                intro="Enter the features and description for {name} Offer.",
+                placeholder="Example: - 6 video modules\n- Workbook and guided meditations\n- Private community access",
+                max_chars=TEXT_MAX_CHARS,
+            ),
+            Field(
+                key="benefits",
+                widget="text_area",
+                label="{name} Offer Benefits",
+                intro="Enter the benefits for {name} Offer.",
+                placeholder="Example: - Achieve inner peace and balance\n- Reduce stress and anxiety\n- Cultivate mindfulness and presence",
+                max_chars=TEXT_MAX_CHARS,
+            ),
+        ),
+    ),
+)
+
+
+@dataclass(frozen=True)
+class WidgetSpec:
+    # One widget call: st.<widget>(label, **kwargs); column is where its value
+    # goes in the payload (or ticket item)
+    column: str
+    widget: str
+    label: str
+    kwargs: dict
+    heading: str = None
+    intro: str = None
+    required: bool = False
+    max_chars: int = None
+
+
+@dataclass(frozen=True)
+class SectionPlan:
+    title: str
+    description: str
+    widgets: tuple
+
+
+@dataclass(frozen=True)
+class RenderPlan:
+    version: int
+    sections: tuple
+    count_widget: WidgetSpec
+    # ticket_order widget per offering count, and item widgets per ticket name
+    order_widgets: dict
+    ticket_headings: dict
+    ticket_widgets: dict
+    group_key: str
+
+    def build_payload(self, values, count, order, items):
+        payload = {
+            spec.column: values[spec.column]
+            for section in self.sections
+            for spec in section.widgets
+        }
+        payload[self.count_widget.column] = int(count)
+        payload[self.order_widgets[int(count)].column] = list(order)
+        payload[self.group_key] = list(items)
+        return payload
+
+
+def _widget_spec(field, key, **names):
+    label = field.label.format(**names)
+    kwargs = {"key": key}
+    if field.label_visibility != "visible":
+        kwargs["label_visibility"] = field.label_visibility
+    if field.help:
+        kwargs["help"] = field.help.format(**names)
+    if field.widget in ("text_area", "text_input"):
+        if field.placeholder:
+            kwargs["placeholder"] = field.placeholder.format(**names)
+        if field.max_chars:
+            kwargs["max_chars"] = field.max_chars
+    elif field.widget == "selectbox":
+        kwargs.update(options=field.options, index=field.index)
+    elif field.widget == "number_input":
+        for name in ("min_value", "max_value", "value", "step"):
+            if getattr(field, name) is not None:
+                kwargs[name] = getattr(field, name)
+    return WidgetSpec(
+        column=field.key,
+        widget=field.widget,
+        label=label,
+        kwargs=kwargs,
+        heading=field.heading.format(**names) if field.heading else None,
+        intro=field.intro.format(**names) if field.intro else None,
+        required=field.required,
+        max_chars=field.max_chars,
+    )
+
+
+def compile_schema(schema):
+    group = schema.repeat_group
+    count = group.count_field
+    sections = tuple(
+        SectionPlan(
+            title=section.title,
+            description=section.description,
+            widgets=tuple(_widget_spec(field, field.key) for field in section.fields),
+        )
+        for section in schema.sections
+    )
+    order_widgets = {}
+    for n in range(count.min_value, count.max_value + 1):
+        names = list(group.names_for(n))
+        spec = _widget_spec(group.order_field, group.order_field.key)
+        # The offering names on offer depend on the count
+        spec.kwargs.update(options=names, default=names)
+        order_widgets[n] = spec
+    ticket_widgets = {
+        name: tuple(
+            _widget_spec(
+                field, f"{field.key}_{name}", name=name, name_lower=name.lower()
+            )
+            for field in group.item_fields
+        )
+        for name in group.names
+    }
+    return RenderPlan(
+        version=schema.version,
+        sections=sections,
+        count_widget=_widget_spec(count, count.key),
+        order_widgets=order_widgets,
+        ticket_headings={name: group.heading.format(name=name) for name in group.names},
+        ticket_widgets=ticket_widgets,
+        group_key=group.key,
+    )
+
+
+@lru_cache(maxsize=None)
+def render_plan():
+    # Compiled once per process
+    return compile_schema(SCHEMA)
@@ -0,0 +1,43 @@
+import os
+import time
+from contextlib import contextmanager
+
+from usage_ledger import UsageLedger
+
+# Opt-in capture of every backend interaction (Supabase reads and writes, LLM
+# generations with their inputs and timings) as JSONL, for bench.py to replay.
+# Records carry submission rows and prompts, so this is off unless
+# RECORD_REQUESTS_PATH is set.
+RECORD_REQUESTS_PATH = os.getenv("RECORD_REQUESTS_PATH")
+RECORD_REQUESTS_MAX_BYTES = int(
+    os.getenv("RECORD_REQUESTS_MAX_BYTES", str(100 * 1024 * 1024))
+)
+
+# Same buffered background writer as the usage ledger
+_writer = (
+    UsageLedger(path=RECORD_REQUESTS_PATH, max_bytes=RECORD_REQUESTS_MAX_BYTES)
+    if RECORD_REQUESTS_PATH
+    else None
+)
+
+
+def record_interaction(stage, **fields):
+    if _writer is not None:
+        _writer.record(stage=stage, **fields)
+
+
+@contextmanager
+def recorded(stage, **fields):
+    # Times the block and records it along with fields; the block can add
+    # result fields (cache hit, returned row) to the yielded dict
+    if _writer is None:
+        yield fields
+        return
+    started = time.perf_counter()
+    try:
+        yield fields
+    except Exception as error:
+        fields["error"] = repr(error)
+        raise
+    finally:
+        record_interaction(stage, latency_s=time.perf_counter() - started, **fields)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import streamlit as st
+
+# Generated outputs kept for the rest of the session, keyed by (email, topic,
+# input hash), so showing, downloading or saving a result reads it back
+# instead of generating it again. Each session's store is bounded by entry
+# count and total characters, least recently used first out.
+RESULT_STORE_MAX_ENTRIES = int(os.getenv("RESULT_STORE_MAX_ENTRIES", "20"))
+RESULT_STORE_MAX_CHARS = int(os.getenv("RESULT_STORE_MAX_CHARS", "200000"))
+
+_SESSION_KEY = "_results"
+
+
+def input_hash(inputs):
+    data = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def result_key(email, topic, inputs):
+    return (email, topic, input_hash(inputs))
+
+
+@dataclass
+class StoredResult:
+    text: str
+    # Timing and cache details from the job that produced it
+    details: dict = field(default_factory=dict)
+    saved: bool = False
+
+
+class ResultStore:
+    def __init__(
+        self, max_entries=RESULT_STORE_MAX_ENTRIES, max_chars=RESULT_STORE_MAX_CHARS
+    ):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.chars = 0
+        self.evictions = 0
+        self._results = OrderedDict()
+        # Jobs still generating a result, by the key they will be stored under
+        self._jobs = OrderedDict()
+
+    def get(self, key):
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        self._jobs.pop(key, None)
+        previous = self._results.pop(key, None)
+        if previous is not None:
+            self.chars -= len(previous.text)
+        self._results[key] = result
+        self.chars += len(result.text)
+        # Always keep the newest result, even if it alone is over budget
+        while len(self._results) > 1 and (
+            len(self._results) > self.max_entries or self.chars > self.max_chars
+        ):
+            _, evicted = self._results.popitem(last=False)
+            self.chars -= len(evicted.text)
+            self.evictions += 1
+        return result
+
+    def start_job(self, key, job_id):
+        self._jobs[key] = job_id
+        self._jobs.move_to_end(key)
+        while len(self._jobs) > self.max_entries:
+            self._jobs.popitem(last=False)
+
+    def job_for(self, key):
+        return self._jobs.get(key)
+
+    def finish_job(self, key, job_id, result):
+        # Stores a finished job's result the first time it is shown; later
+        # calls (a fragment rerun for a button) return what is stored, with
+        # any changes made since, like saved
+        if self._jobs.get(key) == job_id or key not in self._results:
+            return self.put(key, result)
+        return self.get(key)
+
+    def stats(self):
+        return {
+            "entries": len(self._results),
+            "chars": self.chars,
+            "pending_jobs": len(self._jobs),
+            "evictions": self.evictions,
+            "max_entries": self.max_entries,
+            "max_chars": self.max_chars,
+        }
+
+
+def session_results():
+    if _SESSION_KEY not in st.session_state:
+        st.session_state[_SESSION_KEY] = ResultStore()
+    return st.session_state[_SESSION_KEY]
@@ -0,0 +1,31 @@
+import dspy
+
+from context_serializer import serialize_context, serialize_submission
+
+# Signatures shared by the Streamlit pages, importable without running a page
+# (bench.py replays recorded generations through them)
+
+
+class BusinessSummary(dspy.Signature):
+    """Generate a copywriting business breakdown based on the business background and details"""
+
+    form_data = dspy.InputField(
+        desc="Business Background and details coming from Supabase form data",
+        format=serialize_submission,
+    )
+    summary = dspy.OutputField(
+        desc="A copywriting breakdown of a business and its menu in a voice to target the brand"
+    )
+
+
+class BusinessAnalysis(dspy.Signature):
+    """Generate a business analysis based on the provided context"""
+
+    context = dspy.InputField(
+        desc="Business background and details, including additional user input",
+        format=serialize_context,
+    )
+    topic = dspy.InputField(desc="The topic for the business analysis")
+    analysis = dspy.OutputField(
+        desc="A business analysis based on the provided context and topic"
+    )
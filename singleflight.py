@@ -0,0 +1,93 @@
+import threading
+
+# Coalesces concurrent identical calls within a process. The first caller for
+# a key runs the call; callers arriving while it is in flight wait for it and
+# share its result or exception. Nothing is kept once the call returns, so
+# this sits in front of a cache (prediction_cache, submission_cache) rather
+# than replacing one: it covers the window in which the cache is still empty.
+
+# Every group, for flight_stats()
+_groups = []
+
+
+class FlightAbandoned(RuntimeError):
+    # The leader stopped without a result (e.g. a stream nobody finished
+    # reading); waiters should make the call themselves
+    pass
+
+
+class Flight:
+    def __init__(self):
+        self._done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("in-flight call did not finish in time")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+        _groups.append(self)
+
+    def join(self, key):
+        # (flight, True) for the caller that has to make the call and then
+        # finish() it; (flight, False) for callers that should wait on it
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            return flight, True
+
+    def finish(self, key, flight, result=None, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.result = result
+        flight.error = error
+        flight._done.set()
+
+    def do(self, key, fn, *args, **kwargs):
+        while True:
+            flight, leader = self.join(key)
+            if leader:
+                break
+            try:
+                return flight.wait()
+            except FlightAbandoned:
+                continue
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as error:
+            self.finish(key, flight, error=error)
+            raise
+        except BaseException:
+            self.finish(key, flight, error=FlightAbandoned(self.name))
+            raise
+        self.finish(key, flight, result=result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "coalesced_rate": self.coalesced / self.calls if self.calls else 0.0,
+                "in_flight": len(self._flights),
+            }
+
+
+def flight_stats():
+    return {group.name: group.stats() for group in _groups}
@@ -0,0 +1,328 @@
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import dsp
+import dspy
+
+from clients import get_openai
+from hedging import (
+    LLM_DEADLINE_S,
+    DeadlineExceeded,
+    hedge_metrics,
+    hedged_call,
+    is_timeout_error,
+)
+from prediction_cache import cache_key, prediction_cache
+from recorder import record_interaction
+from singleflight import FlightAbandoned, SingleFlight
+from token_budget import completion_budget, count_tokens, fit_prompt
+from usage_ledger import email_hash, estimate_cost, usage_ledger
+
+logger = logging.getLogger(__name__)
+
+# Most recent generation timings in this process, newest last
+generation_timings = deque(maxlen=1000)
+
+# Identical generations in flight at once, keyed like the prediction cache
+prediction_flights = SingleFlight("predictions")
+
+
+@dataclass
+class GenerationTiming:
+    model: str
+    signature: str
+    first_token_s: float = None
+    total_s: float = None
+    cache_hit: bool = False
+    prompt_tokens: int = None
+    completion_tokens: int = None
+    # Shared another caller's in-flight generation (see singleflight.py)
+    coalesced: bool = False
+
+
+def signature_template(signature):
+    # The dsp.Template dspy.Predict renders a class signature with, built from
+    # the fields dspy 2.1 keeps on signature.signature, plus the name of the
+    # first output field
+    fields = signature.signature
+    template = dsp.Template(signature.instructions, **vars(fields))
+    return template, next(iter(fields.output_fields()))
+
+
+class StreamingPredict:
+    """dspy.Predict that can stream the completion as it is generated"""
+
+    def __init__(self, signature, lm=None, cache=prediction_cache):
+        self.predict = dspy.Predict(signature)
+        self.signature = self.predict.signature
+        self.template, self.output_field = signature_template(self.signature)
+        self.lm = lm
+        self.cache = cache
+
+    def __call__(self, force=False, tags=None, **inputs):
+        generation = self.stream(force=force, tags=tags, **inputs)
+        for _ in generation:
+            pass
+        return generation.prediction
+
+    def stream(self, force=False, tags=None, **inputs):
+        # force=True skips the cache lookup but still stores the new completion.
+        # tags (email, topic) only label the usage ledger record.
+        return StreamingGeneration(
+            self, self.lm or dsp.settings.lm, inputs, force, tags=tags
+        )
+
+
+class StreamingGeneration:
+    # Iterate to receive text chunks; text, prediction and timing are set once
+    # the stream is exhausted
+
+    def __init__(
+        self,
+        predictor,
+        lm,
+        inputs,
+        force=False,
+        deadline_s=LLM_DEADLINE_S,
+        tags=None,
+    ):
+        self.predictor = predictor
+        self.lm = lm
+        self.force = force
+        self.deadline_s = deadline_s
+        self.tags = tags or {}
+        self.requested_inputs = inputs
+        self.text = None
+        self.prediction = None
+        self.timing = GenerationTiming(
+            model=lm.kwargs["model"], signature=predictor.signature.__name__
+        )
+        # Trim low-priority fields until the prompt fits the token budget
+        self.inputs, self.prompt, self.timing.prompt_tokens = fit_prompt(
+            lambda inputs: predictor.template(dsp.Example(demos=[], **inputs)),
+            inputs,
+            self.timing.model,
+        )
+        self.example = dsp.Example(demos=[], **self.inputs)
+        self._cache_key = None
+
+    def request_params(self, lm=None):
+        # lm is the backend a router picked; defaults to this generation's lm
+        lm = lm or self.lm
+        params = {
+            key: value
+            for key, value in lm.kwargs.items()
+            if key in ("model", "temperature", "max_tokens", "top_p", "stop")
+        }
+        if "max_tokens" in params:
+            params["max_tokens"] = completion_budget(
+                self.timing.prompt_tokens, params["model"], params["max_tokens"]
+            )
+        params["messages"] = [{"role": "user", "content": self.prompt}]
+        return params
+
+    def cache_key(self):
+        # Computed once, before routing, so the key doesn't depend on which
+        # backend ends up answering. The rendered prompt covers the template
+        # (instructions, field prefixes, descriptions, format) as well as the
+        # inputs, and every LM kwarg is included, so editing either one misses.
+        if self._cache_key is None:
+            params = self.request_params()
+            del params["messages"]
+            self._cache_key = cache_key(
+                {"name": self.predictor.signature.__name__, "prompt": self.prompt},
+                params["model"],
+                {**self.lm.kwargs, **params},
+                self.inputs,
+            )
+        return self._cache_key
+
+    def cached_completion(self):
+        if self.predictor.cache is None or self.force:
+            return None
+        completion = self.predictor.cache.get(self.cache_key())
+        if completion is not None:
+            self.timing.cache_hit = True
+            self.timing.first_token_s = self.timing.total_s = 0.0
+            self.record_timing()
+        return completion
+
+    def __iter__(self):
+        cached = self.cached_completion()
+        if cached is not None:
+            yield cached
+            self.complete(cached)
+            return
+
+        # An identical generation already running in this process is shared
+        # instead of paid for twice; its text arrives in one piece when done
+        key = self.cache_key()
+        while True:
+            flight, leader = prediction_flights.join(key)
+            if leader:
+                break
+            started = time.perf_counter()
+            try:
+                text = flight.wait()
+            except FlightAbandoned:
+                continue
+            self.timing.coalesced = True
+            self.timing.first_token_s = self.timing.total_s = (
+                time.perf_counter() - started
+            )
+            self.record_timing()
+            yield text
+            self.complete(text)
+            return
+
+        text = None
+        error = FlightAbandoned(prediction_flights.name)
+        try:
+            yield from self._stream()
+            text = self.text
+        except Exception as stream_error:
+            error = stream_error
+            raise
+        finally:
+            if text is not None:
+                error = None
+            prediction_flights.finish(key, flight, result=text, error=error)
+
+    def _stream(self):
+        started = time.perf_counter()
+        chunks = []
+        stream = self.open_stream()
+        try:
+            for event in self._events(stream, started):
+                if not event.choices:
+                    continue
+                delta = event.choices[0].delta.content
+                if not delta:
+                    continue
+                if self.timing.first_token_s is None:
+                    self.timing.first_token_s = time.perf_counter() - started
+                chunks.append(delta)
+                yield delta
+        finally:
+            stream.close()
+            self.timing.total_s = time.perf_counter() - started
+            self.record_timing()
+
+        self.complete("".join(chunks))
+
+    def _events(self, stream, started):
+        # The deadline covers the whole generation. A stream that keeps
+        # trickling is cut off at the next event past it; one that stalls hits
+        # its read timeout, which open_stream set to the budget left.
+        events = iter(stream)
+        while True:
+            try:
+                event = next(events)
+            except StopIteration:
+                return
+            except Exception as error:
+                if not is_timeout_error(error):
+                    raise
+                hedge_metrics.add(deadlines_exceeded=1)
+                raise DeadlineExceeded(
+                    f"{self.timing.signature} stalled past {self.deadline_s:.0f}s"
+                ) from error
+            if time.perf_counter() - started > self.deadline_s:
+                hedge_metrics.add(deadlines_exceeded=1)
+                raise DeadlineExceeded(
+                    f"{self.timing.signature} ran past {self.deadline_s:.0f}s"
+                )
+            yield event
+
+    def open_stream(self):
+        # Errors surface when the stream is opened, before anything has been
+        # shown, so the call can still fail over or be hedged here. Each
+        # attempt's timeout is what is left of the deadline when it starts,
+        # so reads of the stream that follows can't outlast the deadline.
+        def attempt(lm, timeout):
+            return get_openai().chat.completions.create(
+                stream=True, timeout=timeout, **self.request_params(lm)
+            )
+
+        backend, stream = hedged_call(
+            attempt, self.lm, self.deadline_s, close=lambda stream: stream.close()
+        )
+        self.timing.model = backend.kwargs["model"]
+        return stream
+
+    def record_timing(self):
+        if self.timing.first_token_s is None:
+            # Nothing was streamed; the whole wait was time to "first token"
+            self.timing.first_token_s = self.timing.total_s
+        generation_timings.append(self.timing)
+        logger.info(
+            "%s on %s: first token %.2fs, total %.2fs, cache hit %s",
+            self.timing.signature,
+            self.timing.model,
+            self.timing.first_token_s,
+            self.timing.total_s,
+            self.timing.cache_hit,
+        )
+
+    def complete(self, text):
+        # Parse the raw completion into the signature's output field
+        self.text = text
+        self.timing.completion_tokens = count_tokens(text, self.timing.model)
+        # A coalesced generation's leader has already stored the text
+        if (
+            self.predictor.cache is not None
+            and not self.timing.cache_hit
+            and not self.timing.coalesced
+        ):
+            self.predictor.cache.put(self.cache_key(), text)
+        completed = self.predictor.template.extract(self.example, text)
+        output_field = self.predictor.output_field
+        self.prediction = dspy.Prediction(
+            **{output_field: completed.get(output_field, text.strip())}
+        )
+        self.record_usage()
+        self.record_interaction()
+        return self.prediction
+
+    def record_interaction(self):
+        # Enough to replay this generation through bench.py
+        params = self.request_params()
+        del params["messages"]
+        record_interaction(
+            "llm",
+            signature=self.timing.signature,
+            model=self.timing.model,
+            params=params,
+            inputs=self.requested_inputs,
+            force=self.force,
+            cache_hit=self.timing.cache_hit,
+            prompt_tokens=self.timing.prompt_tokens,
+            completion_tokens=self.timing.completion_tokens,
+            first_token_s=self.timing.first_token_s,
+            latency_s=self.timing.total_s,
+        )
+
+    def record_usage(self):
+        timing = self.timing
+        usage_ledger.record(
+            model=timing.model,
+            signature=timing.signature,
+            prompt_tokens=timing.prompt_tokens,
+            completion_tokens=timing.completion_tokens,
+            latency_s=timing.total_s,
+            first_token_s=timing.first_token_s,
+            cache_hit=timing.cache_hit,
+            coalesced=timing.coalesced,
+            # Cache hits and coalesced calls cost nothing
+            cost_usd=(
+                0.0
+                if timing.cache_hit or timing.coalesced
+                else estimate_cost(
+                    timing.model, timing.prompt_tokens, timing.completion_tokens
+                )
+            ),
+            email_hash=email_hash(self.tags.get("email")),
+            topic=self.tags.get("topic", self.inputs.get("topic")),
+        )
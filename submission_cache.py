@@ -0,0 +1,125 @@
+import os
+import threading
+
+from cachetools import TTLCache
+
+from recorder import recorded
+from singleflight import SingleFlight
+
+# Process-wide cache of form_submissions rows keyed by (email, columns).
+# Streamlit keeps imported modules alive between reruns and sessions, so every
+# app running in the same server process shares this instance. Invalidation is
+# per process too: each app started with its own `streamlit run` (llm3lit,
+# llm4, llm5) only sees another app's writes once its own entry expires, so the
+# TTL bounds how stale an edited submission can look elsewhere.
+SUBMISSION_CACHE_SIZE = int(os.getenv("SUBMISSION_CACHE_SIZE", "512"))
+SUBMISSION_CACHE_TTL = float(os.getenv("SUBMISSION_CACHE_TTL", "60"))
+
+# Sentinel for "not cached". Missing rows are never cached, so an email that
+# submits after its first lookup is found on the next one.
+_MISSING = object()
+
+
+class SubmissionCache:
+    def __init__(self, maxsize=SUBMISSION_CACHE_SIZE, ttl=SUBMISSION_CACHE_TTL):
+        # TTLCache evicts expired entries first, then the least recently used
+        self._rows = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, email, columns="*"):
+        with self._lock:
+            row = self._rows.get((email, columns), _MISSING)
+            if row is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return row
+
+    def put(self, email, row, columns="*"):
+        if row is None:
+            return
+        with self._lock:
+            self._rows[(email, columns)] = row
+
+    def invalidate(self, email):
+        # Drop every cached projection of this email's row
+        with self._lock:
+            for key in [key for key in self._rows if key[0] == email]:
+                del self._rows[key]
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._rows),
+                "maxsize": self._rows.maxsize,
+                "ttl": self._rows.ttl,
+            }
+
+
+submission_cache = SubmissionCache()
+submission_flights = SingleFlight("submissions")
+
+
+def fetch_submission(supabase, email, columns="*"):
+    # Read-through lookup: only go to Supabase when the row isn't cached
+    with recorded(
+        "db.select", table="form_submissions", email=email, columns=columns
+    ) as record:
+        row = submission_cache.get(email, columns)
+        record["cache_hit"] = row is not _MISSING
+        if row is _MISSING:
+            # Concurrent misses for the same row share one request
+            row = submission_flights.do(
+                (email, columns), _select_submission, supabase, email, columns
+            )
+        record["row"] = row
+    return row
+
+
+def _select_submission(supabase, email, columns):
+    result = (
+        supabase.table("form_submissions").select(columns).eq("email", email).limit(1)
+    ).execute()
+    row = result.data[0] if result.data else None
+    submission_cache.put(email, row, columns)
+    return row
+
+
+def refresh_submission(email, row):
+    # Called after a write so readers see the stored row without a round trip.
+    # Narrower projections are dropped and refetched on their next read.
+    submission_cache.invalidate(email)
+    submission_cache.put(email, row)
+
+
+async def afetch_submission(postgrest, email, columns="*"):
+    # Same read-through lookup for the async PostgREST client
+    with recorded(
+        "db.select", table="form_submissions", email=email, columns=columns
+    ) as record:
+        row = submission_cache.get(email, columns)
+        record["cache_hit"] = row is not _MISSING
+        if row is _MISSING:
+            result = await (
+                postgrest.from_("form_submissions")
+                .select(columns)
+                .eq("email", email)
+                .limit(1)
+            ).execute()
+            row = result.data[0] if result.data else None
+            submission_cache.put(email, row, columns)
+        record["row"] = row
+    return row
@@ -0,0 +1,46 @@
+import random
+
+import dsp
+
+from fake_supabase import fake_submission
+from funnel import FunnelSection
+from signatures import BusinessAnalysis, BusinessSummary
+from streaming import signature_template
+
+# Renders real prompts through the signatures, format handlers included; needs
+# the packages in requirements.txt but no credentials or network
+
+ROW = fake_submission(0, random.Random(0))
+
+
+def render(signature, **inputs):
+    template, _ = signature_template(signature)
+    return template(dsp.Example(demos=[], **inputs))
+
+
+def test_business_summary_prompt():
+    prompt = render(BusinessSummary, form_data=ROW)
+    assert "Follow the following format." in prompt
+    # The guidelines show the field description, the query the serialized row
+    assert "Business Background and details coming from Supabase form data" in prompt
+    assert "Offers, lowest to highest price:" in prompt
+    assert "1. " in prompt
+
+
+def test_business_analysis_prompt():
+    context = {"row_data": ROW, "additional_input": "Launching in March"}
+    prompt = render(BusinessAnalysis, context=context, topic="Pricing")
+    assert "Ideal client:" in prompt
+    assert "Additional context: Launching in March" in prompt
+    assert "Pricing" in prompt
+
+
+def test_funnel_section_prompt():
+    prompt = render(
+        FunnelSection,
+        form_data=ROW,
+        section="Hero",
+        section_template="Headline:\nSubheadline:",
+    )
+    assert "Offers, lowest to highest price:" in prompt
+    assert "Headline:" in prompt
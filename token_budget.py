@@ -0,0 +1,152 @@
+import logging
+import os
+from functools import lru_cache
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Prompt tokens allowed per call, and the context window of each Unify model
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+MIN_COMPLETION_TOKENS = int(os.getenv("MIN_COMPLETION_TOKENS", "256"))
+CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "mixtral-8x7b-instruct-v0.1": 32768,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Fields trimmed first when a prompt is over budget, lowest priority first.
+# Anything not listed is never trimmed.
+TRIM_ORDER = (
+    "uvp_proof",
+    "lead_magnet_desc",
+    "benefits",
+    "features_desc",
+    "avatar_pain_list",
+    "additional_input",
+    "avatar_desc",
+    "unique_value_prop",
+)
+TRIM_MARKER = " [...]"
+
+
+class PromptTooLong(ValueError):
+    pass
+
+
+def base_model(model):
+    # "gpt-3.5-turbo@openai" -> "gpt-3.5-turbo"
+    return model.split("@", 1)[0]
+
+
+@lru_cache(maxsize=None)
+def encoding_for(model):
+    try:
+        return tiktoken.encoding_for_model(base_model(model))
+    except KeyError:
+        # Non-OpenAI models: cl100k is a close enough estimate for budgeting
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model):
+    return len(encoding_for(model).encode(text, disallowed_special=()))
+
+
+def context_window(model):
+    return CONTEXT_WINDOWS.get(base_model(model), DEFAULT_CONTEXT_WINDOW)
+
+
+def _field_texts(value, key=None):
+    # (key, text) for every string in a nested submission/context structure
+    if isinstance(value, dict):
+        for child_key, child in value.items():
+            yield from _field_texts(child, child_key)
+    elif isinstance(value, (list, tuple)):
+        for child in value:
+            yield from _field_texts(child, key)
+    elif isinstance(value, str):
+        yield key, value
+
+
+def field_token_counts(inputs, model):
+    counts = {}
+    for key, text in _field_texts(inputs):
+        counts[key] = counts.get(key, 0) + count_tokens(text, model)
+    return counts
+
+
+def _truncate(value, key, max_tokens, model):
+    # Cut every string stored under `key` to at most max_tokens tokens
+    if isinstance(value, dict):
+        return {
+            child_key: (
+                _truncate_text(child, max_tokens, model)
+                if child_key == key and isinstance(child, str)
+                else _truncate(child, key, max_tokens, model)
+            )
+            for child_key, child in value.items()
+        }
+    if isinstance(value, list):
+        return [_truncate(child, key, max_tokens, model) for child in value]
+    return value
+
+
+def _truncate_text(text, max_tokens, model):
+    encoding = encoding_for(model)
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]) + TRIM_MARKER
+
+
+def fit_prompt(render, inputs, model, budget=PROMPT_TOKEN_BUDGET):
+    # Render the prompt and, while it is over budget, trim the lowest-priority
+    # fields. Returns the (possibly trimmed) inputs, the prompt and its size.
+    # The budget never leaves less than MIN_COMPLETION_TOKENS of the context
+    # window for the completion.
+    budget = min(budget, context_window(model) - MIN_COMPLETION_TOKENS)
+    prompt = render(inputs)
+    prompt_tokens = count_tokens(prompt, model)
+    trimmed = []
+    for key in TRIM_ORDER:
+        if prompt_tokens <= budget:
+            break
+        counts = field_token_counts(inputs, model)
+        if not counts.get(key):
+            continue
+        # Shrink the field by the overage, spread over its occurrences, making
+        # room for the marker each cut adds
+        occurrences = sum(1 for k, _ in _field_texts(inputs) if k == key)
+        keep = max(
+            0,
+            (counts[key] - (prompt_tokens - budget)) // occurrences
+            - count_tokens(TRIM_MARKER, model),
+        )
+        inputs = _truncate(inputs, key, keep, model)
+        prompt = render(inputs)
+        prompt_tokens = count_tokens(prompt, model)
+        trimmed.append(key)
+
+    logger.info(
+        "prompt for %s: %d tokens (budget %d), fields %s, trimmed %s",
+        model,
+        prompt_tokens,
+        budget,
+        field_token_counts(inputs, model),
+        trimmed or "none",
+    )
+    return inputs, prompt, prompt_tokens
+
+
+def completion_budget(prompt_tokens, model, requested):
+    # Never ask for more completion tokens than the context window has left;
+    # a prompt that leaves less than MIN_COMPLETION_TOKENS even after
+    # fit_prompt trimmed it would be rejected by the provider anyway
+    available = context_window(model) - prompt_tokens
+    if available < MIN_COMPLETION_TOKENS:
+        raise PromptTooLong(
+            f"prompt of {prompt_tokens} tokens leaves {available} of {model}'s "
+            f"{context_window(model)} token context window for the completion, "
+            f"need at least {MIN_COMPLETION_TOKENS}"
+        )
+    return max(MIN_COMPLETION_TOKENS, min(requested, available))
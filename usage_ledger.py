@@ -0,0 +1,257 @@
+import argparse
+import atexit
+import fcntl
+import glob
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# One JSONL record per LLM call, written by a background thread in batches so
+# the Streamlit script thread never waits on disk
+USAGE_LOG_PATH = os.getenv("USAGE_LOG_PATH", "openai_usage.log")
+USAGE_LOG_MAX_BYTES = int(os.getenv("USAGE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+USAGE_LOG_BACKUPS = int(os.getenv("USAGE_LOG_BACKUPS", "5"))
+USAGE_LOG_BATCH_SIZE = int(os.getenv("USAGE_LOG_BATCH_SIZE", "50"))
+USAGE_LOG_FLUSH_INTERVAL_S = float(os.getenv("USAGE_LOG_FLUSH_INTERVAL_S", "2"))
+
+# USD per million tokens (input, output), by base model name
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "mixtral-8x7b-instruct-v0.1": (0.60, 0.60),
+}
+
+# Queue marker for "nothing arrived within the flush interval"
+_IDLE = object()
+
+
+def email_hash(email):
+    if not email:
+        return None
+    return hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()[:16]
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    prices = MODEL_PRICES.get(model.split("@", 1)[0])
+    if prices is None or prompt_tokens is None:
+        return None
+    input_price, output_price = prices
+    completion_tokens = completion_tokens or 0
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1e6
+
+
+class UsageLedger:
+    def __init__(
+        self,
+        path=USAGE_LOG_PATH,
+        max_bytes=USAGE_LOG_MAX_BYTES,
+        backups=USAGE_LOG_BACKUPS,
+        batch_size=USAGE_LOG_BATCH_SIZE,
+        flush_interval_s=USAGE_LOG_FLUSH_INTERVAL_S,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.dropped = 0
+        self.write_errors = 0
+        self._queue = queue.Queue(maxsize=10000)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="usage-ledger", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, **fields):
+        fields.setdefault("ts", datetime.now(timezone.utc).isoformat())
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            # Never block a generation on bookkeeping
+            self.dropped += 1
+
+    def close(self):
+        # Never blocks on a full queue: the writer also checks the flag, and
+        # drains what is queued before it stops
+        self._closed.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        batch = []
+        last_flush = time.monotonic()
+        while True:
+            try:
+                record = self._queue.get(timeout=self.flush_interval_s)
+            except queue.Empty:
+                record = _IDLE
+            if record is None or self._closed.is_set():
+                if record not in (None, _IDLE):
+                    batch.append(record)
+                while True:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is not None:
+                        batch.append(record)
+                self._write(batch)
+                return
+            if record is not _IDLE:
+                batch.append(record)
+            # Flush on a full batch, or once records have waited long enough
+            if (
+                len(batch) >= self.batch_size
+                or time.monotonic() - last_flush >= self.flush_interval_s
+            ):
+                self._write(batch)
+                batch = []
+                last_flush = time.monotonic()
+
+    def _write(self, batch):
+        # A failed write loses its batch but never the writer thread
+        if not batch:
+            return
+        try:
+            # Every app and worker process appends to the same log; the lock
+            # keeps one process's rotation from racing another's
+            with open(f"{self.path}.lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self._rotate_if_needed()
+                with open(self.path, "a") as f:
+                    f.writelines(
+                        json.dumps(record, separators=(",", ":"), default=str) + "\n"
+                        for record in batch
+                    )
+        except Exception:
+            self.write_errors += 1
+            self.dropped += len(batch)
+            logger.exception("could not write %d usage records", len(batch))
+
+    def _rotate_if_needed(self):
+        # Called with the lock held, so the size seen is after any rotation
+        # another process just did
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except FileNotFoundError:
+            return
+        # openai_usage.log -> .1 -> .2 ..., dropping the oldest
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+usage_ledger = UsageLedger()
+
+
+def _backup_index(file_path):
+    suffix = file_path.rsplit(".", 1)[-1]
+    return int(suffix) if suffix.isdigit() else None
+
+
+def read_records(path=USAGE_LOG_PATH):
+    # Rotated backups oldest first (.10 before .9 ... .1), then the current log
+    backups = [
+        file_path
+        for file_path in glob.glob(f"{glob.escape(path)}.*")
+        if _backup_index(file_path) is not None
+    ]
+    backups.sort(key=_backup_index, reverse=True)
+    for file_path in backups + [path]:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(records):
+    groups = defaultdict(list)
+    for record in records:
+        groups[(record["ts"][:10], record.get("model"))].append(record)
+
+    rows = []
+    for (day, model), group in sorted(groups.items()):
+        # Only calls that went to the model; coalesced ones waited on another
+        latencies = [
+            r["latency_s"]
+            for r in group
+            if not r.get("cache_hit") and not r.get("coalesced")
+        ]
+        rows.append(
+            {
+                "day": day,
+                "model": model,
+                "calls": len(group),
+                "cache_hits": sum(1 for r in group if r.get("cache_hit")),
+                "coalesced": sum(1 for r in group if r.get("coalesced")),
+                "prompt_tokens": sum(r.get("prompt_tokens") or 0 for r in group),
+                "completion_tokens": sum(
+                    r.get("completion_tokens") or 0 for r in group
+                ),
+                "cost_usd": round(sum(r.get("cost_usd") or 0 for r in group), 4),
+                "latency_p50_s": _percentile(latencies, 0.5),
+                "latency_p95_s": _percentile(latencies, 0.95),
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Aggregate the LLM usage ledger into per-day, per-model cost "
+        "and latency"
+    )
+    parser.add_argument("--path", default=USAGE_LOG_PATH)
+    parser.add_argument("--json", action="store_true", help="print JSON lines")
+    args = parser.parse_args()
+
+    rows = summarize(read_records(args.path))
+    if args.json:
+        for row in rows:
+            print(json.dumps(row))
+        return
+
+    header = (
+        f"{'day':<10}  {'model':<40} {'calls':>6} {'hits':>5} {'in tok':>9} "
+        f"{'out tok':>9} {'cost $':>9} {'p50 s':>7} {'p95 s':>7}"
+    )
+    print(header)
+    for row in rows:
+        p50 = row["latency_p50_s"]
+        p95 = row["latency_p95_s"]
+        print(
+            f"{row['day']:<10}  {str(row['model']):<40} {row['calls']:>6} "
+            f"{row['cache_hits']:>5} {row['prompt_tokens']:>9} "
+            f"{row['completion_tokens']:>9} {row['cost_usd']:>9.4f} "
+            f"{p50 if p50 is None else round(p50, 2)!s:>7} "
+            f"{p95 if p95 is None else round(p95, 2)!s:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+import streamlit as st
+
+from context_serializer import PLACEHOLDER_PREFIX
+from questionnaire_schema import render_plan
+
+# Field-level validation for the questionnaire. check_field() and
+# validate_payload() are plain functions, run again server-side before the
+# upsert. In a session, every field's last seen value, whether the user has
+# touched it, and its current errors live in session_state. Only fields whose
+# value changed are re-checked, so Submit reads the errors it already has
+# instead of scanning all of session_state.
+#
+# Streamlit only allows callbacks on a form's submit button, so track_form()
+# is that button's on_click: the form's values all arrive together, just
+# before the rerun.
+_SESSION_KEY = "_validation"
+
+
+@dataclass(frozen=True)
+class FieldError:
+    key: str
+    label: str
+    message: str
+
+
+def check_field(spec, value):
+    # Messages for one widget value; empty when it's valid
+    errors = []
+    if isinstance(value, str):
+        text = value.strip()
+        example = spec.kwargs.get("placeholder")
+        if spec.required and not text:
+            errors.append(f"{spec.label} is required.")
+        elif text.startswith(PLACEHOLDER_PREFIX) or (example and text == example):
+            errors.append(f"{spec.label} still has the example text.")
+        if spec.max_chars and len(value) > spec.max_chars:
+            errors.append(f"{spec.label} is longer than {spec.max_chars} characters.")
+    elif spec.required and value is None:
+        errors.append(f"{spec.label} is required.")
+    return errors
+
+
+def _field_errors(spec, value):
+    return [
+        FieldError(spec.kwargs["key"], spec.label, message)
+        for message in check_field(spec, value)
+    ]
+
+
+def validate_payload(payload, plan=None):
+    # Server-side check of a built payload; returns FieldErrors, empty if valid
+    plan = plan or render_plan()
+    errors = []
+    for section in plan.sections:
+        for spec in section.widgets:
+            errors.extend(_field_errors(spec, payload.get(spec.column)))
+
+    count_spec = plan.count_widget
+    count = payload.get(count_spec.column)
+    if count not in plan.order_widgets:
+        message = f"{count_spec.label} must be between {min(plan.order_widgets)} and {max(plan.order_widgets)}."
+        return errors + [
+            FieldError(count_spec.kwargs["key"], count_spec.label, message)
+        ]
+    order_spec = plan.order_widgets[count]
+    order = payload.get(order_spec.column) or []
+    items = payload.get(plan.group_key) or []
+    unknown = [name for name in order if name not in order_spec.kwargs["options"]]
+    if unknown or len(items) != len(order):
+        message = f"{order_spec.label} doesn't match the offerings submitted."
+        errors.append(FieldError(order_spec.kwargs["key"], order_spec.label, message))
+        return errors
+    for name, item in zip(order, items):
+        for spec in plan.ticket_widgets[name]:
+            errors.extend(_field_errors(spec, item.get(spec.column)))
+    return errors
+
+
+@lru_cache(maxsize=None)
+def _fields():
+    # Widget key -> (spec, ticket name or None), in form order
+    plan = render_plan()
+    fields = {}
+    for section in plan.sections:
+        for spec in section.widgets:
+            fields[spec.kwargs["key"]] = (spec, None)
+    for name, specs in plan.ticket_widgets.items():
+        for spec in specs:
+            fields[spec.kwargs["key"]] = (spec, name)
+    return fields
+
+
+@lru_cache(maxsize=None)
+def _positions():
+    return {key: position for position, key in enumerate(_fields())}
+
+
+def _default(spec):
+    if spec.widget == "selectbox":
+        return spec.kwargs["options"][spec.kwargs["index"]]
+    return spec.kwargs.get("value", "")
+
+
+@lru_cache(maxsize=None)
+def _initial_errors():
+    # Every field at its default value; copied into each new session
+    errors = {}
+    for key, (spec, _) in _fields().items():
+        messages = check_field(spec, _default(spec))
+        if messages:
+            errors[key] = messages
+    return errors
+
+
+def _session():
+    if _SESSION_KEY not in st.session_state:
+        st.session_state[_SESSION_KEY] = {
+            "seen": {},
+            "touched": set(),
+            "errors": dict(_initial_errors()),
+        }
+    return st.session_state[_SESSION_KEY]
+
+
+def track_field(key, value):
+    # Re-checks the field only if its value changed since it was last seen
+    entry = _fields().get(key)
+    state = _session()
+    if entry is None or (key in state["seen"] and state["seen"][key] == value):
+        return
+    spec, _ = entry
+    state["seen"][key] = value
+    if value != _default(spec):
+        state["touched"].add(key)
+    messages = check_field(spec, value)
+    if messages:
+        state["errors"][key] = messages
+    else:
+        state["errors"].pop(key, None)
+
+
+def track_form():
+    # on_click of the form's submit button; fields not rendered this run (tickets
+    # beyond the chosen count) aren't in session_state and keep their last state
+    for key in _fields():
+        if key in st.session_state:
+            track_field(key, st.session_state[key])
+
+
+def touched_fields():
+    return frozenset(_session()["touched"])
+
+
+def session_errors(ticket_names):
+    # Current errors of the fields on the page: the sections plus the given
+    # tickets. Proportional to the number of invalid fields, not the form.
+    active = set(ticket_names)
+    fields = _fields()
+    errors = []
+    for key, messages in _session()["errors"].items():
+        spec, name = fields[key]
+        if name is None or name in active:
+            errors.extend(FieldError(key, spec.label, message) for message in messages)
+    return sorted(errors, key=lambda error: _positions()[error.key])
@@ -0,0 +1,271 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
+from clients import get_supabase, unify_lm
+from hedging import DeadlineExceeded, hedge_metrics
+from jobs import JOB_TIMEOUT_S, job_queue
+from model_router import unify_router
+from outputs import insert_analyses, save_summary
+from signatures import BusinessAnalysis, BusinessSummary
+from singleflight import flight_stats
+from streaming import StreamingPredict
+
+logger = logging.getLogger(__name__)
+
+# Runs the generation jobs the pages enqueue (see jobs.py) in a pool of worker
+# processes, so a Streamlit rerun never cancels or repeats a generation. Each
+# process claims one job at a time, publishes the text as it streams in, and
+# writes the result to Supabase itself.
+#
+#   python worker.py --processes 4
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_S = float(os.getenv("JOB_POLL_S", "1"))
+JOB_PROGRESS_INTERVAL_S = float(os.getenv("JOB_PROGRESS_INTERVAL_S", "0.5"))
+JOB_PRUNE_INTERVAL_S = 3600
+# A running job is marked alive this often, so a long batch isn't mistaken for
+# one whose worker died (see JOB_TIMEOUT_S in jobs.py)
+JOB_HEARTBEAT_S = float(os.getenv("JOB_HEARTBEAT_S", str(JOB_TIMEOUT_S / 10)))
+# How often an idle worker republishes its stats for the pages
+JOB_STATS_INTERVAL_S = float(os.getenv("JOB_STATS_INTERVAL_S", "10"))
+# Topics of one batch analysis generated at once
+ANALYSIS_MAX_CONCURRENCY = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "4"))
+
+SUMMARY_MODEL = "mixtral-8x7b-instruct-v0.1@together-ai"
+ANALYSIS_MODELS = ("gpt-3.5-turbo@openai", "mixtral-8x7b-instruct-v0.1@together-ai")
+
+
+@lru_cache(maxsize=None)
+def summary_predictor():
+    return StreamingPredict(BusinessSummary, lm=unify_lm(SUMMARY_MODEL))
+
+
+@lru_cache(maxsize=None)
+def analysis_predictor():
+    # Each request goes to whichever model is currently fastest and healthy
+    return StreamingPredict(
+        BusinessAnalysis, lm=unify_router(*ANALYSIS_MODELS, max_tokens=2**12)
+    )
+
+
+def stream_into(generation, progress):
+    # Drains the generation, publishing the text so far at most every
+    # JOB_PROGRESS_INTERVAL_S
+    chunks = []
+    published = time.monotonic()
+    for chunk in generation:
+        chunks.append(chunk)
+        if time.monotonic() - published >= JOB_PROGRESS_INTERVAL_S:
+            progress("".join(chunks))
+            published = time.monotonic()
+    return {
+        "cache_hit": generation.timing.cache_hit,
+        "first_token_s": generation.timing.first_token_s,
+        "total_s": generation.timing.total_s,
+    }
+
+
+def run_summary(payload, progress):
+    email = payload["email"]
+    generation = summary_predictor().stream(
+        force=payload["force"], tags={"email": email}, form_data=payload["form_data"]
+    )
+    timing = stream_into(generation, progress)
+    summary = generation.prediction.summary
+    save_summary(get_supabase(), email, summary)
+    return {"summary": summary, "saved": True, **timing}
+
+
+def run_analysis(payload, progress):
+    email = payload["email"]
+    generation = analysis_predictor().stream(
+        force=payload["force"],
+        tags={"email": email},
+        context=payload["context"],
+        topic=payload["topic"],
+    )
+    timing = stream_into(generation, progress)
+    analysis = generation.prediction.analysis
+    if payload.get("save"):
+        insert_analyses(
+            get_supabase(), email, payload["context"], {payload["topic"]: analysis}
+        )
+    return {"analysis": analysis, "saved": bool(payload.get("save")), **timing}
+
+
+def _analyze_topic(payload, topic):
+    generation = analysis_predictor().stream(
+        force=payload["force"],
+        tags={"email": payload["email"], "topic": topic},
+        context=payload["context"],
+        topic=topic,
+    )
+    timing = stream_into(generation, lambda text: None)
+    return {"analysis": generation.prediction.analysis, **timing}
+
+
+def run_analysis_batch(payload, progress):
+    # Every topic for the same context at once, up to ANALYSIS_MAX_CONCURRENCY.
+    # Progress is the JSON of the topics finished so far, so pages can show
+    # each one as soon as it is done. The rows are inserted in one request.
+    topics = payload["topics"]
+    analyses = {}
+    errors = {}
+    workers = max(1, min(ANALYSIS_MAX_CONCURRENCY, len(topics)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_analyze_topic, payload, topic): topic for topic in topics
+        }
+        for future in as_completed(futures):
+            topic = futures[future]
+            try:
+                analyses[topic] = future.result()
+            except DeadlineExceeded:
+                errors[topic] = "The model didn't respond in time, please try again."
+            except Exception as error:
+                logger.exception("analysis of %r failed", topic)
+                errors[topic] = f"{type(error).__name__}: {error}"
+            progress(json.dumps({"analyses": analyses, "total": len(topics)}))
+
+    # Back in the order the topics were asked for
+    analyses = {topic: analyses[topic] for topic in topics if topic in analyses}
+    saved = bool(payload.get("save") and analyses)
+    if saved:
+        insert_analyses(
+            get_supabase(),
+            payload["email"],
+            payload["context"],
+            {topic: result["analysis"] for topic, result in analyses.items()},
+        )
+    return {"analyses": analyses, "errors": errors, "saved": saved}
+
+
+HANDLERS = {
+    "business_summary": run_summary,
+    "business_analysis": run_analysis,
+    "business_analysis_batch": run_analysis_batch,
+}
+
+
+def heartbeat(job, queue, stop):
+    while not stop.wait(JOB_HEARTBEAT_S):
+        if not queue.heartbeat(job.id, job.worker):
+            return
+
+
+def run_job(job, queue=job_queue):
+    handler = HANDLERS.get(job.kind)
+    if handler is None:
+        queue.fail(job.id, job.worker, f"Unknown job kind {job.kind!r}")
+        return
+    # Keeps the job from looking stale while nothing is published, e.g. while
+    # waiting on a slow first token or between the topics of a batch
+    stop = threading.Event()
+    threading.Thread(
+        target=heartbeat, args=(job, queue, stop), name="job-heartbeat", daemon=True
+    ).start()
+    try:
+        result = handler(
+            job.payload, lambda text: queue.progress(job.id, job.worker, text)
+        )
+    except DeadlineExceeded:
+        owned = queue.fail(
+            job.id, job.worker, "The model didn't respond in time, please try again."
+        )
+    except Exception as error:
+        logger.exception("%s job %s failed", job.kind, job.id)
+        owned = queue.fail(job.id, job.worker, f"{type(error).__name__}: {error}")
+    else:
+        owned = queue.finish(job.id, job.worker, result)
+    finally:
+        stop.set()
+    if not owned:
+        # Requeued after missing heartbeats; whoever holds it now reports it
+        logger.warning("%s lost the lease on job %s", job.worker, job.id)
+
+
+def worker_stats():
+    # What the pages can no longer see for themselves now that generation
+    # happens here: routing decisions and per-model latency, hedging, and
+    # coalesced calls, for this worker process
+    return {
+        "routing": analysis_predictor().lm.snapshot(),
+        "hedging": hedge_metrics.snapshot(),
+        "coalesced": flight_stats(),
+    }
+
+
+def publish_stats(name, queue):
+    try:
+        queue.publish_stats(name, worker_stats())
+    except Exception:
+        logger.exception("could not publish stats of %s", name)
+
+
+def work(name, queue=job_queue, poll_s=JOB_POLL_S):
+    logging.basicConfig(level=logging.INFO)
+    logger.info("worker %s started", name)
+    pruned_at = 0.0
+    published_at = 0.0
+    while True:
+        job = queue.claim(name)
+        if job is not None:
+            logger.info("%s running %s job %s", name, job.kind, job.id)
+            run_job(job, queue)
+            publish_stats(name, queue)
+            published_at = time.monotonic()
+            continue
+        if time.monotonic() - published_at > JOB_STATS_INTERVAL_S:
+            publish_stats(name, queue)
+            published_at = time.monotonic()
+        # Idle: recover jobs of dead workers and drop old results
+        requeued, failed = queue.requeue_stale()
+        if requeued or failed:
+            logger.warning("requeued %d and failed %d stale jobs", requeued, failed)
+        if time.monotonic() - pruned_at > JOB_PRUNE_INTERVAL_S:
+            queue.prune()
+            pruned_at = time.monotonic()
+        time.sleep(poll_s)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued generation jobs")
+    parser.add_argument("--processes", type=int, default=JOB_WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # Spawned, not forked: each process opens its own SQLite connections and
+    # HTTP pools
+    context = multiprocessing.get_context("spawn")
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    processes = {}
+    try:
+        while True:
+            # Replace any worker that died
+            for index in range(args.processes):
+                process = processes.get(index)
+                if process is None or not process.is_alive():
+                    if process is not None:
+                        logger.warning(
+                            "worker %d exited with %s", index, process.exitcode
+                        )
+                    process = context.Process(
+                        target=work, args=(f"{prefix}-{index}",), daemon=True
+                    )
+                    process.start()
+                    processes[index] = process
+            time.sleep(JOB_POLL_S)
+    except KeyboardInterrupt:
+        for process in processes.values():
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()